@@ -1,15 +1,97 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Request
 from starlette.websockets import WebSocketState
+import asyncio
 import json
+from contextlib import aclosing
+import logging
+import time
+from services.metrics import trace, STAGE_SECONDS, STAGE_ERRORS
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+
+async def send_frame(websocket: WebSocket, frame: dict) -> bool:
+    """Send a frame unless the socket is gone, False when the client has disconnected"""
+    if websocket.client_state != WebSocketState.CONNECTED:
+        return False
+    try:
+        await websocket.send_text(json.dumps(frame))
+        return True
+    except Exception:
+        # Turns run in tasks nothing awaits, a closed socket must not raise out of them
+        return False
+
+
+async def stream_turn(websocket: WebSocket, query: str, session_id: str, turn_id):
+    """
+    Send one answer as stream_start, delta... and stream_end frames.
+    stream_end reports the answer's sources, time-to-first-token and total
+    time for the turn, or error: true when the answer failed part way.
+    """
+    started = time.perf_counter()
+    first_token_at = None
+    meta = {}
+
+    if not await send_frame(websocket, {"type": "stream_start", "turn_id": turn_id}):
+        return
+
+    try:
+        with trace("chat_turn", session_id=session_id, turn_id=turn_id, stream=True):
+            # aclosing closes the LLM stream as soon as the turn stops, not when the generator is collected
+            async with aclosing(websocket.app.state.ai_agent.stream_response(query, session_id, meta)) as deltas:
+                async for delta in deltas:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    if not await send_frame(websocket, {"type": "delta", "turn_id": turn_id, "content": delta}):
+                        # The client went away, a normal end of the turn rather than a failed answer
+                        logger.debug(f"Client of {session_id} disconnected during turn {turn_id}")
+                        return
+    except asyncio.CancelledError:
+        await send_frame(websocket, {"type": "stream_end", "turn_id": turn_id, "cancelled": True})
+        raise
+    except Exception as e:
+        STAGE_ERRORS.labels("chat_stream").inc()
+        logger.error(f"Streaming turn {turn_id} for {session_id} failed: {str(e)}")
+        await send_frame(websocket, {
+            "type": "stream_end",
+            "turn_id": turn_id,
+            "error": True,
+            "message": "The answer could not be completed, please try again"
+        })
+        return
+
+    finished = time.perf_counter()
+    STAGE_SECONDS.labels("chat_stream").observe(finished - started)
+    if first_token_at:
+        STAGE_SECONDS.labels("chat_ttft").observe(first_token_at - started)
+    ttft_ms = round((first_token_at - started) * 1000, 1) if first_token_at else None
+    total_ms = round((finished - started) * 1000, 1)
+    logger.debug(f"Turn {turn_id} for {session_id}: ttft={ttft_ms}ms total={total_ms}ms")
+    await send_frame(websocket, {
+        "type": "stream_end",
+        "turn_id": turn_id,
+        "sources": meta.get("sources", []),
+        "cached": meta.get("cached", False),
+        "ttft_ms": ttft_ms,
+        "total_ms": total_ms
+    })
+
+
+def cancel_turn(task):
+    if task and not task.done():
+        task.cancel()
+
+
 @router.websocket("/chat")
 async def websocket_endpoint(websocket: WebSocket):
+    session_id = None
+    current_turn = None
+    turn_counter = 0
     try:
         await websocket.accept()
-        session_id = None
-        
+
         while True:
             try:
                 message = await websocket.receive_text()
@@ -23,7 +105,11 @@ async def websocket_endpoint(websocket: WebSocket):
                     }))
                     continue
 
-                if message_data['type'] == 'message':
+                if message_data['type'] == 'cancel':
+                    cancel_turn(current_turn)
+                    continue
+
+                if message_data['type'] in ('message', 'stream'):
                     if not session_id:
                         await websocket.send_text(json.dumps({
                             "type": "error",
@@ -31,10 +117,25 @@ async def websocket_endpoint(websocket: WebSocket):
                         }))
                         continue
 
-                    response = await websocket.app.state.ai_agent.get_response(
-                        message_data['content'], 
-                        session_id
-                    )
+                    # A new question supersedes whatever is still streaming
+                    cancel_turn(current_turn)
+
+                if message_data['type'] == 'stream':
+                    turn_counter += 1
+                    current_turn = asyncio.create_task(stream_turn(
+                        websocket,
+                        message_data['content'],
+                        session_id,
+                        message_data.get('turn_id', turn_counter)
+                    ))
+                    continue
+
+                if message_data['type'] == 'message':
+                    with trace("chat_turn", session_id=session_id, stream=False):
+                        response = await websocket.app.state.ai_agent.get_response(
+                            message_data['content'],
+                            session_id
+                        )
                     await websocket.send_text(response)
 
             except json.JSONDecodeError:
@@ -42,7 +143,7 @@ async def websocket_endpoint(websocket: WebSocket):
                     "type": "error",
                     "message": "Invalid message format"
                 }))
-                
+
     except WebSocketDisconnect:
         print(f"Client disconnected: {session_id}")
     except Exception as e:
@@ -51,4 +152,6 @@ async def websocket_endpoint(websocket: WebSocket):
             await websocket.send_text(json.dumps({
                 "type": "error",
                 "message": f"Server error: {str(e)}"
-            }))
\ No newline at end of file
+            }))
+    finally:
+        cancel_turn(current_turn)
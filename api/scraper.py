@@ -1,33 +1,56 @@
-from fastapi import APIRouter, BackgroundTasks, Form
-from services.scraper import start_scraping, scraped_urls, failed_urls, scraping_status
-from services.qdrant import qdrant_client
+import json
+from fastapi import APIRouter, Form, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from services.jobs import SessionBusy
+from services.scraper import scheduler
 from services.utility import is_url_safe
 
 
 router = APIRouter()
 
 @router.post("/scrape")
-async def scrape_url(background_tasks: BackgroundTasks, url: str = Form(...), session_id: str = Form(...)):
+async def scrape_url(url: str = Form(...), session_id: str = Form(...), incremental: bool | None = Form(None)):
+    """incremental=false forces a full rebuild of the session, unset follows INCREMENTAL_CRAWL"""
     try:
 
-        is_safe, reason = is_url_safe(url)
+        # The Safe Browsing lookup is a blocking network call
+        is_safe, reason = await run_in_threadpool(is_url_safe, url)
         if not is_safe:
             return {
                 "status": "error",
                 "message": f"URL rejected: {reason}"
             }
 
-        background_tasks.add_task(start_scraping, url, session_id)
-        return {"status": "success", "message": "Scraping started"}
+        job = scheduler.submit(url, session_id, incremental=incremental)
+        return {"status": "success", "message": "Scraping started", "job_id": job.id}
+    except SessionBusy as e:
+        return {"status": "error", "message": str(e), "job_id": e.job.id}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 @router.get("/scraping-status")
-async def get_scraping_status():
-    return {
-        "status": "success",
-        "message": scraping_status.current_message,
-        "scraped": len(scraped_urls),
-        "failed": len(failed_urls),
-        "completed": scraping_status.is_completed
-    }
\ No newline at end of file
+async def get_scraping_status(job_id: str = None, session_id: str = None):
+    job = scheduler.get(job_id) if job_id else scheduler.latest_for_session(session_id)
+    if job is None:
+        return {"status": "error", "message": "Unknown job"}
+    return {"status": "success", **job.progress()}
+
+@router.get("/scraping-progress/{job_id}")
+async def stream_scraping_progress(job_id: str, request: Request):
+    """Server-Sent Events feed of a job's progress, ends once the job completes"""
+    job = scheduler.get(job_id)
+    if job is None:
+        return {"status": "error", "message": "Unknown job"}
+
+    async def events():
+        async for snapshot in job.channel.subscribe():
+            if await request.is_disconnected():
+                break
+            if snapshot is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: progress\ndata: {json.dumps({'status': 'success', **snapshot})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,93 @@
+"""
+Cold-start import budget, run from the repository root:
+
+    python -m benchmarks.import_time --budget-ms 1500
+
+Imports main_ in a fresh interpreter with -X importtime and fails (exit 1)
+when it takes longer than the budget or when one of the heavy SDKs, which
+must only load on first use, is imported eagerly. No service is contacted.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Only imported on first use, importing them with main_ is a regression
+DEFERRED = ("qdrant_client", "mistralai", "google.generativeai", "sentence_transformers", "torch",
+            "huggingface_hub", "pysafebrowsing")
+
+PROBE = f"""
+import sys
+import main_
+print("LOADED " + " ".join(name for name in {DEFERRED!r} if name in sys.modules))
+"""
+
+
+def measure(runs):
+    env = dict(os.environ)
+    from benchmarks.stubs import BENCH_ENV
+    for key, value in BENCH_ENV.items():
+        env.setdefault(key, value)
+
+    samples, loaded, modules = [], set(), {}
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE],
+                                capture_output=True, text=True, env=env, check=True)
+        for line in result.stdout.splitlines():
+            if line.startswith("LOADED"):
+                loaded.update(line.split()[1:])
+        # "import time: self [us] | cumulative | imported package", nested imports are
+        # indented two spaces per level and listed before the module that imported them
+        children = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            name, ms = name.strip(), int(cumulative) / 1000
+            if depth == 1:
+                children[name] = ms
+            elif depth == 0:
+                if name == "main_":
+                    samples.append(ms)
+                    for child, child_ms in children.items():
+                        modules[child] = max(modules.get(child, 0), child_ms)
+                children = {}
+    return samples, sorted(loaded), modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time budget for main_")
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--runs", type=int, default=5, help="the median run is compared to the budget")
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to report")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    samples, loaded, modules = measure(args.runs)
+    median = sorted(samples)[len(samples) // 2]
+    slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]
+    results = {"median_ms": round(median, 1), "budget_ms": args.budget_ms,
+               "runs_ms": [round(sample, 1) for sample in samples], "eager_heavy_imports": loaded,
+               "slowest": {name: round(ms, 1) for name, ms in slowest}}
+
+    print(f"import main_: median {results['median_ms']}ms over {args.runs} runs (budget {args.budget_ms}ms)")
+    for name, ms in slowest:
+        print(f"  {ms:8.1f}ms  {name}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    if median > args.budget_ms:
+        failures.append(f"import took {median:.0f}ms, over the {args.budget_ms:.0f}ms budget")
+    if loaded:
+        failures.append(f"heavy SDKs imported eagerly: {', '.join(loaded)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Offline benchmark of crawl, ingest and chat, run from the repository root:
+
+    python -m benchmarks.run --pages 300 --clients 16 --turns 10
+
+Everything runs locally (see benchmarks/stubs.py), so numbers are comparable
+between commits on the same machine. --json writes the results for CI diffs.
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+
+
+def percentile(samples, q):
+    """Nearest-rank percentile"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def latency_summary(samples_ms):
+    return {
+        "count": len(samples_ms),
+        "p50_ms": percentile(samples_ms, 50),
+        "p95_ms": percentile(samples_ms, 95),
+        "p99_ms": percentile(samples_ms, 99),
+        "max_ms": max(samples_ms) if samples_ms else None,
+    }
+
+
+def bench_crawl(site, session_id, mode, workers):
+    from config.config import settings
+    from services.jobs import ScrapeJob, WorkerBudget
+    from services.scraper import start_scraping
+    from services import offload
+
+    job = ScrapeJob(site.start_url, session_id, max_workers=workers, url_limit=site.pages,
+                    mode=mode, incremental=False)
+    job.budget = WorkerBudget(settings.CRAWL_WORKER_BUDGET)
+    job.budget.register(job.id)
+    # Spawning the ingestion pool is a startup cost (STARTUP_WARMUP), not crawl time
+    offload.warm_up()
+    started = time.perf_counter()
+    result = start_scraping(job)
+    elapsed = time.perf_counter() - started
+    if not result.get("success"):
+        raise RuntimeError(f"Crawl failed: {result.get('error')}")
+    return {
+        "mode": mode,
+        "pages": len(job.scraped_urls),
+        "failed": len(job.failed_urls),
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(len(job.scraped_urls) / elapsed, 1),
+    }
+
+
+def bench_upsert(session_id):
+    from qdrant_client.http.models import Filter, FieldCondition, MatchValue
+    from config.config import settings
+    from services.qdrant import get_qdrant_client, ensure_qdrant_collection
+    from services.scraper import upsert_to_qdrant
+
+    sparse = ensure_qdrant_collection() and settings.RETRIEVAL_MODE == "hybrid"
+    started = time.perf_counter()
+    upsert_to_qdrant(session_id, sparse=sparse)
+    elapsed = time.perf_counter() - started
+    chunks = get_qdrant_client().count(
+        collection_name=settings.COLLECTION_NAME,
+        count_filter=Filter(must=[FieldCondition(key="session_id", match=MatchValue(value=session_id))]),
+        exact=True,
+    ).count
+    return {
+        "chunks": chunks,
+        "seconds": round(elapsed, 3),
+        "chunks_per_sec": round(chunks / elapsed, 1),
+    }
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _questions(count, seed):
+    rng = random.Random(seed)
+    from benchmarks.site import TOPICS, WORDS
+    templates = [
+        "How do I configure {topic}?", "What does the --max-depth flag do for {topic}?",
+        "Why do I get ERR_{code} during {topic}?", "Explain {word} handling in {topic}",
+    ]
+    return [
+        rng.choice(templates).format(topic=rng.choice(TOPICS), word=rng.choice(WORDS),
+                                     code=rng.choice(TOPICS).upper().replace(" ", "_"))
+        for _ in range(count)
+    ]
+
+
+async def _chat_client(port, session_id, questions, latencies, errors):
+    import websockets
+    async with websockets.connect(f"ws://127.0.0.1:{port}/api/chat") as websocket:
+        await websocket.send(json.dumps({"type": "init", "session_id": session_id}))
+        await websocket.recv()
+        for question in questions:
+            started = time.perf_counter()
+            await websocket.send(json.dumps({"type": "message", "content": question}))
+            reply = await websocket.recv()
+            latencies.append((time.perf_counter() - started) * 1000)
+            if reply.startswith("An error occurred"):
+                errors.append(reply)
+
+
+def bench_chat(session_id, clients, turns, seed):
+    """Latency of RAGAgent.get_response through the websocket, clients chatting concurrently"""
+    import uvicorn
+    from main_ import app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="benchmark-server", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    questions = _questions(clients * turns, seed)
+    latencies, errors = [], []
+
+    async def run_clients():
+        await asyncio.gather(*(
+            _chat_client(port, session_id, questions[i * turns:(i + 1) * turns], latencies, errors)
+            for i in range(clients)
+        ))
+
+    try:
+        started = time.perf_counter()
+        asyncio.run(run_clients())
+        elapsed = time.perf_counter() - started
+    finally:
+        server.should_exit = True
+        thread.join()
+    return {
+        "clients": clients,
+        "turns": len(latencies),
+        "errors": len(errors),
+        "turns_per_sec": round(len(latencies) / elapsed, 1),
+        **{key: round(value, 1) if isinstance(value, float) else value
+           for key, value in latency_summary(latencies).items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline SmartAgent benchmark")
+    parser.add_argument("--pages", type=int, default=200, help="synthetic site size")
+    parser.add_argument("--page-latency-ms", type=float, default=0.0, help="server delay per page")
+    parser.add_argument("--mode", choices=["async", "threads"], default=None, help="crawl mode (default: CRAWL_MODE)")
+    parser.add_argument("--workers", type=int, default=10, help="thread-mode crawl workers")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent websocket clients")
+    parser.add_argument("--turns", type=int, default=10, help="questions per client")
+    parser.add_argument("--embed-ms", type=float, default=5.0, help="embedding call latency")
+    parser.add_argument("--summary-ms", type=float, default=50.0, help="Gemini summary latency")
+    parser.add_argument("--llm-ms", type=float, default=300.0, help="Mistral completion latency")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip", nargs="*", default=[], choices=["crawl", "upsert", "chat"])
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    from benchmarks import stubs
+    stubs.install(embed_ms=args.embed_ms, summary_ms=args.summary_ms, llm_ms=args.llm_ms)
+    from benchmarks.site import SyntheticSite
+    from config.config import settings
+
+    session_id = "benchmark"
+    results = {}
+    with SyntheticSite(args.pages, seed=args.seed, latency=args.page_latency_ms / 1000) as site:
+        if "crawl" not in args.skip:
+            results["crawl"] = bench_crawl(site, session_id, args.mode or settings.CRAWL_MODE, args.workers)
+            print(f"crawl   {results['crawl']}")
+    if "upsert" not in args.skip:
+        results["upsert"] = bench_upsert(session_id)
+        print(f"upsert  {results['upsert']}")
+    if "chat" not in args.skip:
+        results["chat"] = bench_chat(session_id, args.clients, args.turns, args.seed)
+        print(f"chat    {results['chat']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
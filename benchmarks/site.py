@@ -0,0 +1,100 @@
+"""Synthetic documentation site served from a local HTTP server"""
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TOPICS = [
+    "installation", "configuration", "authentication", "deployment", "logging", "caching",
+    "migrations", "webhooks", "rate limits", "pagination", "testing", "plugins",
+]
+WORDS = (
+    "client server request response token session index query vector cluster node shard replica "
+    "timeout retry backoff header payload schema field option flag default value environment "
+    "variable release version upgrade endpoint resource permission role policy bucket queue worker"
+).split()
+
+
+def _sentence(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 18))).capitalize() + "."
+
+
+def render_page(index: int, pages: int, seed: int = 0) -> str:
+    """Deterministic page with nav chrome, headings, paragraphs, a code block and links"""
+    rng = random.Random(seed * 100_003 + index)
+    topic = TOPICS[index % len(TOPICS)]
+    nav = "".join(f'<li><a href="/docs/{i}">Page {i}</a></li>' for i in range(min(pages, 10)))
+    links = "".join(
+        f'<li><a href="/docs/{rng.randrange(pages)}">See also</a></li>' for _ in range(5)
+    )
+    if index * 2 + 2 < pages:
+        links += f'<li><a href="/docs/{index * 2 + 1}">Next</a></li><li><a href="/docs/{index * 2 + 2}">More</a></li>'
+
+    sections = []
+    for section in range(rng.randint(2, 4)):
+        paragraphs = "".join(
+            f"<p>{' '.join(_sentence(rng) for _ in range(rng.randint(3, 6)))}</p>"
+            for _ in range(rng.randint(2, 4))
+        )
+        sections.append(f"<h2>{topic.title()} step {section + 1}</h2>{paragraphs}")
+    code = f"<pre><code>$ smartagent {topic.replace(' ', '-')} --max-depth {index % 7} --retries 3\n"\
+           f"ERR_{topic.upper().replace(' ', '_')}_{index % 13}</code></pre>"
+
+    return (
+        f"<html><head><title>{topic.title()} guide {index}</title></head><body>"
+        f"<nav><ul>{nav}</ul></nav>"
+        f"<main><h1>{topic.title()} guide {index}</h1>{''.join(sections)}{code}<ul>{links}</ul></main>"
+        f"<footer>Copyright SmartAgent benchmark</footer></body></html>"
+    )
+
+
+class SyntheticSite:
+    """Serves /docs/0 .. /docs/{pages-1} on 127.0.0.1, pages are rendered once up front"""
+
+    def __init__(self, pages: int = 200, seed: int = 0, latency: float = 0.0):
+        self.pages = pages
+        self._html = [render_page(i, pages, seed).encode("utf-8") for i in range(pages)]
+        self._server = None
+        self._thread = None
+        self.latency = latency
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                try:
+                    index = int(self.path.rstrip("/").rsplit("/", 1)[-1])
+                    body = site._html[index]
+                except (ValueError, IndexError):
+                    self.send_error(404)
+                    return
+                if site.latency:
+                    threading.Event().wait(site.latency)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    @property
+    def start_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/docs/0"
+
+    def __enter__(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="synthetic-site", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,169 @@
+"""
+Local stand-ins for every external service, installed before the app is imported:
+Mongo -> mongomock, Qdrant -> in-memory local mode, and Gemini, Mistral and
+the embedding backend -> fakes that sleep for a configurable latency.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+DIMENSIONS = 384
+WORD_RE = re.compile(r"\w+")
+
+BENCH_ENV = {
+    "MONGODB_URL": "mongodb://benchmark",
+    "QDRANT_HOST": ":memory:",
+    "QDRANT_API_KEY": "",
+    "MISTRAL_API_KEY": "benchmark",
+    "GOOGLE_API_KEY": "benchmark",
+    "HF_API_KEY": "benchmark",
+    "SAFETY_MODE": "off",
+    "SAFETY_CHECK_LINKS": "false",  # the synthetic site is plain http on localhost
+    "EMBEDDING_CACHE_ENABLED": "false",
+    "CRAWL_MAX_DEPTH": "50",
+}
+
+
+class FakeEmbeddingBackend:
+    """Hashed bag-of-words vectors, so similar texts still land near each other"""
+
+    cache_name = "benchmark-hashing"
+
+    def __init__(self, latency: float = 0.0, per_text: float = 0.0):
+        self.latency = latency
+        self.per_text = per_text
+
+    @staticmethod
+    def vector(text: str):
+        values = [0.0] * DIMENSIONS
+        for word in WORD_RE.findall(text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=4).digest()
+            bucket = int.from_bytes(digest, "little")
+            values[bucket % DIMENSIONS] += 1.0 if bucket & 1 << 31 else -1.0
+        norm = sum(v * v for v in values) ** 0.5 or 1.0
+        return [v / norm for v in values]
+
+    def embed(self, texts):
+        time.sleep(self.latency + self.per_text * len(texts))
+        return [self.vector(text) for text in texts]
+
+
+class FakeGeminiModel:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def generate_content(self, prompt: str):
+        time.sleep(self.latency)
+        text = prompt.rsplit("\n\n", 1)[-1].strip()
+        return SimpleNamespace(text=text[:300])
+
+
+class _FakeStream:
+    def __init__(self, text: str, latency: float, chunks: int = 20):
+        self._words = text.split(" ")
+        self._delay = latency / chunks
+        self._size = max(1, len(self._words) // chunks)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def __aiter__(self):
+        for i in range(0, len(self._words), self._size):
+            await asyncio.sleep(self._delay)
+            content = " ".join(self._words[i:i + self._size]) + " "
+            yield SimpleNamespace(data=SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))]))
+
+
+class FakeMistral:
+    """chat.complete_async / chat.stream_async with a fixed generation latency"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.chat = self
+
+    @staticmethod
+    def _answer(messages) -> str:
+        prompt = messages[-1].content
+        return "Based on the sources: " + " ".join(prompt.split()[:120])
+
+    async def complete_async(self, model, messages, **kwargs):
+        await asyncio.sleep(self.latency)
+        message = SimpleNamespace(content=self._answer(messages))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    async def stream_async(self, model, messages, **kwargs):
+        return _FakeStream(self._answer(messages), self.latency)
+
+
+class SerializedClient:
+    """Local-mode Qdrant is not thread-safe, the upserter's parallel requests must take turns"""
+
+    def __init__(self, client):
+        self._client = client
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+
+        def call(*args, **kwargs):
+            with self._lock:
+                return method(*args, **kwargs)
+        return call
+
+
+class AsyncFacade:
+    """
+    Async view of the sync local-mode client. Separate ":memory:" clients do
+    not share data, so the agent's async client must read what ingestion wrote.
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+def install(embed_ms: float = 5.0, embed_per_text_ms: float = 0.2, summary_ms: float = 50.0, llm_ms: float = 300.0):
+    """Configure the environment and patch the service modules, returns the patched modules"""
+    for key, value in BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+
+    import mongomock
+    import pymongo
+    pymongo.MongoClient = mongomock.MongoClient
+
+    import google.generativeai as genai
+    genai.configure = lambda **kwargs: None
+    genai.GenerativeModel = lambda name: FakeGeminiModel(summary_ms / 1000)
+
+    import mistralai
+    mistralai.Mistral = lambda api_key=None: FakeMistral(llm_ms / 1000)
+
+    from services import embeddings, utility, qdrant
+    backend = FakeEmbeddingBackend(embed_ms / 1000, embed_per_text_ms / 1000)
+    embeddings.get_backend = utility.get_backend = lambda: backend
+    embeddings.get_batcher.cache_clear()
+
+    # Ingestion pool workers are spawned fresh, they need the same stand-ins
+    from services import offload
+    offload.set_worker_initializer(install, embed_ms, embed_per_text_ms, summary_ms, llm_ms)
+
+    import qdrant_client
+    local_client = qdrant_client.QdrantClient
+    qdrant_client.QdrantClient = lambda *args, **kwargs: SerializedClient(local_client(*args, **kwargs))
+    qdrant.get_qdrant_client.cache_clear()
+    qdrant_client.AsyncQdrantClient = lambda *args, **kwargs: AsyncFacade(qdrant.get_qdrant_client())
+    qdrant.get_async_qdrant_client.cache_clear()
+    return SimpleNamespace(backend=backend, qdrant=qdrant.get_qdrant_client())
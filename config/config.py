@@ -16,4 +16,113 @@ class Settings(BaseSettings):
     HF_API_KEY: str = os.getenv("HF_API_KEY")
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
 
+    # Embeddings
+    EMBEDDING_BACKEND: str = "local"  # "local" (sentence-transformers) or "api" (HF Inference API)
+    EMBEDDING_DEVICE: str = "cpu"
+    EMBEDDING_ONNX: bool = False
+    EMBEDDING_QUANTIZE: bool = False  # int8
+    EMBEDDING_MAX_BATCH: int = 64
+    EMBEDDING_MAX_WAIT_MS: float = 5.0
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = ".cache/embeddings.sqlite3"
+    EMBEDDING_CACHE_MAX_MB: int = 512
+
+    # Qdrant collection profile
+    QDRANT_HNSW_M: int = 16
+    QDRANT_HNSW_EF_CONSTRUCT: int = 100
+    QDRANT_HNSW_EF: int = 64  # per-query search beam
+    QDRANT_QUANTIZATION: bool = False  # int8 scalar quantization with rescoring
+    QDRANT_QUANTIZATION_ALWAYS_RAM: bool = True
+    QDRANT_RESCORE_OVERSAMPLING: float = 2.0
+    QDRANT_ON_DISK_VECTORS: bool = False
+    QDRANT_ON_DISK_PAYLOAD: bool = False
+
+    # Crawler
+    CRAWL_MODE: str = "async"  # "async" or "threads"
+    CRAWL_CONCURRENCY: int = 20
+    CRAWL_PER_HOST_CONCURRENCY: int = 8
+    CRAWL_HTTP2: bool = True
+    CRAWL_TIMEOUT: float = 10.0
+    CRAWL_MAX_DEPTH: int = 10
+    CRAWL_MAX_BYTES: int = 5 * 1024 * 1024
+    HTML_PARSER: str = "auto"  # "auto", "selectolax", "lxml" or "html.parser"
+    INCREMENTAL_CRAWL: bool = True
+
+    MONGO_BULK_SIZE: int = 100
+    MONGO_TIMEOUT_MS: int = 5000  # server selection, so an unreachable Mongo fails fast
+
+    # Startup
+    STARTUP_WARMUP: bool = False  # load the embedding model and open client pools before reporting ready
+    READINESS_TIMEOUT: float = 2.0  # per dependency check on /readyz
+
+    # Job scheduler
+    MAX_RUNNING_JOBS: int = 8
+    CRAWL_WORKER_BUDGET: int = 64  # page workers shared by all running jobs
+    JOB_HISTORY: int = 500
+    PROGRESS_MIN_INTERVAL: float = 0.5  # seconds between pushed progress snapshots
+    PROGRESS_HEARTBEAT: float = 15.0  # keep-alive comment when nothing changed
+
+    # Ingestion pipeline
+    PIPELINE_QUEUE_SIZE: int = 64
+    EMBED_BATCH_SIZE: int = 32
+    UPSERT_BATCH_SIZE: int = 256
+    UPSERT_PARALLELISM: int = 4
+    UPSERT_MAX_RETRIES: int = 3
+    UPSERT_RETRY_BACKOFF: float = 0.5
+    INGEST_EXECUTION: str = "threads"  # "threads" (in the API process) or "processes" (parse, chunk and local embedding in a process pool)
+    INGEST_PROCESSES: int = 0  # pool size, 0 = one per CPU core
+    INGEST_BATCH_SIZE: int = 16  # pages or documents per pool task
+    INGEST_BATCH_WAIT_MS: float = 20.0
+
+    # Chunking (all-MiniLM-L6-v2 truncates at 256 word pieces)
+    CHUNK_TOKENS: int = 200
+    CHUNK_OVERLAP: int = 40
+
+    # Summaries (precomputed at ingest, stored in the Qdrant payload)
+    INGEST_SUMMARIES: bool = True
+    SUMMARY_CONCURRENCY: int = 8
+    SUMMARY_MIN_CHARS: int = 600
+
+    # Observability
+    METRICS_ENABLED: bool = True  # Prometheus metrics on /metrics
+    TRACE_ENABLED: bool = False  # log per-request spans as JSON on the "smartagent.trace" logger
+    TRACE_MIN_MS: float = 0.0  # only log traces slower than this
+
+    # Retrieval
+    RETRIEVAL_MODE: str = "hybrid"  # "dense" or "hybrid" (dense + BM25 sparse, fused with RRF)
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+    BM25_AVG_CHUNK_TERMS: float = 160.0  # length normalization, about CHUNK_TOKENS of prose
+    RERANKER_MODEL: str = ""  # local cross-encoder, e.g. "cross-encoder/ms-marco-MiniLM-L-6-v2"; empty disables
+
+    # Prompt context packing
+    CONTEXT_CANDIDATES: int = 12  # retrieved before MMR picks the passages
+    CONTEXT_TOKEN_BUDGET: int = 1200
+    CONTEXT_MIN_PASSAGE_TOKENS: int = 40  # shorter truncated tails are dropped instead
+    MMR_LAMBDA: float = 0.7  # 1.0 = pure relevance, lower favours diversity
+    CONTEXT_DEDUP_THRESHOLD: float = 0.95  # cosine similarity treated as a near-duplicate
+
+    # Answer cache (per session, invalidated when the session is re-ingested)
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_THRESHOLD: float = 0.95  # min cosine similarity between questions
+    ANSWER_CACHE_SIZE: int = 2048
+    ANSWER_CACHE_TTL: int = 3600
+
+    # Corpus snapshots (python -m services.snapshot export/import)
+    SNAPSHOT_DIR: str = ".cache/snapshots"
+    SNAPSHOT_DTYPE: str = "float32"  # or "int8", 4x smaller vectors with one scale per row
+    SNAPSHOT_FALLBACK: bool = True  # search a session's snapshot with NumPy while Qdrant is unavailable
+    SNAPSHOT_FALLBACK_MAX_POINTS: int = 200_000  # larger corpora are too slow for a brute-force scan
+
+    # URL safety checks
+    SAFETY_MODE: str = "api"  # "api" (Safe Browsing), "offline" (local hash-prefix list) or "off"
+    SAFETY_HASH_PREFIX_PATH: str = ".cache/safebrowsing_prefixes.txt"  # hex SHA-256 prefixes, one per line
+    SAFETY_CHECK_LINKS: bool = True  # vet crawled links too, not just the submitted URL
+    SAFETY_BATCH_SIZE: int = 500  # Safe Browsing accepts up to 500 URLs per lookup
+    SAFETY_MAX_WAIT_MS: float = 50.0
+    SAFETY_SAFE_TTL: int = 1800  # seconds a "no threat found" verdict is reused
+    SAFETY_UNSAFE_TTL: int = 86400
+    SAFETY_ERROR_TTL: int = 60  # a submitted URL whose lookup failed is refused for this long, crawled links fail open
+    SAFETY_CACHE_SIZE: int = 100_000
+
 settings = Settings()
\ No newline at end of file
@@ -1,19 +1,35 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from api import views, scraper, chat_endpoint
-from services import agent
+from services import agent, lifecycle, metrics
+from starlette.concurrency import run_in_threadpool
+import asyncio
 import time
 import os
 
-app = FastAPI()
-app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="templates")
 
-@app.on_event("startup")
-async def startup_event():
+@asynccontextmanager
+async def lifespan(app: FastAPI):
     app.state.css_version = int(time.time())
     print(f"CSS Version: {app.state.css_version}")
+    app.state.ai_agent = agent.RAGAgent()
+
+    # Index creation and warm-up run in the background, an unreachable
+    # dependency delays readiness instead of blocking startup
+    app.state.prepared = asyncio.create_task(run_in_threadpool(lifecycle.prepare, app.state.ai_agent))
+    try:
+        yield
+    finally:
+        app.state.prepared.cancel()
+        await lifecycle.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+app.mount("/static", StaticFiles(directory="static"), name="static")
+templates = Jinja2Templates(directory="templates")
 
 @app.get("/")
 async def home(request: Request):
@@ -27,13 +43,28 @@ async def how_it_works(request: Request):
 async def chat(request: Request):
     return templates.TemplateResponse("chat.html", {"request": request})
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/healthz")
+async def liveness():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readiness():
+    checks = await lifecycle.readiness()
+    if not app.state.prepared.done():
+        checks["startup"] = "in progress"
+    ready = all(status == "ok" for status in checks.values())
+    return JSONResponse({"status": "ok" if ready else "unavailable", "checks": checks},
+                        status_code=200 if ready else 503)
+
 # Include routers
 app.include_router(views.router)
 app.include_router(scraper.router, prefix="/api")
 app.include_router(chat_endpoint.router, prefix="/api")
 
-app.state.ai_agent = agent.RAGAgent()
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -1,60 +1,184 @@
 from typing import List
-from mistralai import Mistral, UserMessage, SystemMessage
-from services.qdrant import qdrant_client
+from services.qdrant import get_async_qdrant_client, search_params, has_sparse_vectors, dense_vector, DENSE_VECTOR, SPARSE_VECTOR
 from config.config import settings
 import logging
-import google.generativeai as genai
-from services.utility import get_embeddings
+import asyncio
+from services.utility import aembed_query, load_off_loop
+from services.embeddings import get_reranker
+from services.sparse import query_sparse_vector
+from services.summarizer import get_summarizer, needs_summary, SummaryMemo
+from services.answer_cache import get_answer_cache
+from services.context_packer import mmr_select, pack_passages
+from services.snapshot import get_snapshot_index
+from services.metrics import instrument, timed
+
+def _messages(prompt: str):
+    from mistralai import UserMessage, SystemMessage
+    return [
+        SystemMessage(content = "You are a helpful assistant that answers questions based on the provided context"),
+        UserMessage(content = prompt)
+    ]
+
 
 class RAGAgent:
     def __init__(self):
-        self.client = Mistral(api_key = settings.MISTRAL_API_KEY)
+        self._client = None
         self.collection_name = "web_scraped_data"
         self.model_name = "mistral-medium"  
 
-        try:
-            genai.configure(api_key=settings.GOOGLE_API_KEY)
-            self.summarizer = genai.GenerativeModel('gemini-1.5-flash')
+        self._summary_memo = SummaryMemo()
+        self.answer_cache = get_answer_cache()
+        self._hybrid = None
 
-        except :
-            logging.error("Summarizer error")
-        
-    def _summarize_content(self, content: str) -> str:
-        """Summarize content using Google's Generative AI"""
-        try:
-            prompt = f"""Summarize the following text while maintaining key information:
+    @property
+    def client(self):
+        """Mistral client, the SDK is imported on first use"""
+        if self._client is None:
+            from mistralai import Mistral
+            self._client = Mistral(api_key = settings.MISTRAL_API_KEY)
+        return self._client
 
-            {content}
-            """
-            
-            response = self.summarizer.generate_content(prompt)
-            return response.text
-            
-        except Exception as e:
-            logging.error(f"Summarization failed: {str(e)}")
-            return content[:300] + "..."  
+    async def _get_client(self):
+        """The Mistral client, built in a worker thread the first time so the SDK import never blocks the loop"""
+        if self._client is None:
+            await asyncio.to_thread(lambda: self.client)
+        return self._client
+
+    @property
+    def summarizer(self):
+        return get_summarizer()
 
-    def _get_relevant_context(self, query: str, session_id : str, limit: int = 4) -> List[str]:
-        """Retrieve and summarize relevant documents from Qdrant"""
-        query_vector = get_embeddings([query])[0]
+    @instrument("retrieve")
+    async def _get_relevant_context(self, query: str, session_id : str, limit: int = 4,
+                                    query_vector: List[float] = None) -> tuple[List[str], List[str]]:
+        """Retrieve and summarize relevant documents from Qdrant, returns (contexts, source urls)"""
+        if query_vector is None:
+            query_vector = await aembed_query(query)
         
-        search_result = qdrant_client.search(
-            collection_name=self.collection_name,
-            query_vector=query_vector,
-            query_filter={
-            "must": [
-                {"key": "session_id", "match": {"value": session_id}}
-            ]
-            },
-            limit=limit
-        )
+        # Over-fetch with vectors so MMR can drop near-duplicate pages (versions, translations)
+        candidates, relevance = await self._search(query, query_vector, session_id, max(limit, settings.CONTEXT_CANDIDATES))
+        search_result = []
+        if candidates:
+            vectors = [dense_vector(result) for result in candidates]
+            picked = mmr_select(query_vector, vectors, k=limit, relevance=relevance)
+            order = relevance if relevance is not None else [result.score for result in candidates]
+            search_result = [candidates[i] for i in sorted(picked, key=lambda i: order[i], reverse=True)]
         
-        contexts = []
+        # Summaries are normally precomputed at ingest time and stored in the payload.
+        # Short chunks have none and are used as is. Anything else missing is summarized
+        # concurrently and memoized by content, a chunk whose summary failed is used as
+        # is for this answer and tried again next time.
+        summaries = {}
+        missing = []
         for result in search_result:
-            summarized_content = self._summarize_content(result.payload['content'])
-            contexts.append(f"Content: {summarized_content}\nSource: {result.payload['url']}")
+            if not needs_summary(result.payload['content']):
+                summaries[result.id] = result.payload['content']
+                continue
+            summary = result.payload.get('summary') or self._summary_memo.get(result.payload['content'])
+            if summary is None:
+                missing.append(result)
+            else:
+                summaries[result.id] = summary
+
+        if missing:
+            # The summarizer is built on first use, in the worker thread
+            contents = [result.payload['content'] for result in missing]
+            generated = await asyncio.to_thread(lambda: self.summarizer.summarize_many(contents))
+            for result, summary in zip(missing, generated):
+                if summary is None:
+                    summary = result.payload['content']
+                else:
+                    self._summary_memo.put(result.payload['content'], summary)
+                summaries[result.id] = summary
+
+        # Most relevant first, cut to the prompt token budget. Counting tokens may load the tokenizer
+        passages = await asyncio.to_thread(pack_passages, [
+            {"content": summaries[result.id], "url": result.payload['url']} for result in search_result
+        ])
+        contexts = [f"Content: {passage['content']}\nSource: {passage['url']}" for passage in passages]
+        sources = list(dict.fromkeys(passage['url'] for passage in passages))
         
-        return contexts
+        return contexts, sources
+
+    async def _cached_answer(self, query: str, session_id: str):
+        """Returns (cached answer or None, query vector, corpus version)"""
+        version = self.answer_cache.version(session_id) if self.answer_cache else None
+        query_vector = await aembed_query(query)
+        if self.answer_cache is None:
+            return None, query_vector, version
+        return self.answer_cache.get(session_id, query_vector), query_vector, version
+
+    async def _hybrid_enabled(self) -> bool:
+        """Whether the collection has sparse vectors, a failed lookup is retried on the next query"""
+        if settings.RETRIEVAL_MODE != "hybrid":
+            return False
+        if self._hybrid is None:
+            try:
+                collection = await get_async_qdrant_client().get_collection(self.collection_name)
+            except Exception as e:
+                logging.error(f"Collection lookup failed, using dense retrieval for this query: {str(e)}")
+                return False
+            self._hybrid = has_sparse_vectors(collection)
+        return self._hybrid
+
+    @instrument("search")
+    async def _search(self, query: str, query_vector: List[float], session_id: str, limit: int):
+        """
+        Candidate chunks with their dense vectors, plus relevance scores when
+        they are not plain dense cosines (None). Hybrid mode fuses dense and
+        BM25 results with reciprocal rank fusion in a single Qdrant query,
+        the optional local reranker then rescores the fused candidates.
+        When Qdrant fails, the session's snapshot is searched instead, if it has one.
+        """
+        try:
+            qdrant_client = await load_off_loop(get_async_qdrant_client)
+            from qdrant_client import models
+            session_filter = models.Filter(must=[
+                models.FieldCondition(key="session_id", match=models.MatchValue(value=session_id))
+            ])
+            sparse_query = query_sparse_vector(query)
+            if sparse_query.indices and await self._hybrid_enabled():
+                response = await qdrant_client.query_points(
+                    collection_name=self.collection_name,
+                    prefetch=[
+                        models.Prefetch(query=query_vector, using=DENSE_VECTOR, filter=session_filter,
+                                        params=search_params(), limit=limit),
+                        models.Prefetch(query=sparse_query, using=SPARSE_VECTOR, filter=session_filter, limit=limit),
+                    ],
+                    query=models.FusionQuery(fusion=models.Fusion.RRF),
+                    limit=limit,
+                    with_payload=True,
+                    with_vectors=[DENSE_VECTOR],
+                )
+                candidates = response.points
+                relevance = [result.score for result in candidates]
+            else:
+                response = await qdrant_client.query_points(
+                    collection_name=self.collection_name,
+                    query=query_vector,
+                    query_filter=session_filter,
+                    limit=limit,
+                    with_payload=True,
+                    with_vectors=True,
+                    search_params=search_params()
+                )
+                candidates = response.points
+                relevance = None
+        except Exception as e:
+            # Small corpora with a snapshot stay searchable while Qdrant is down
+            index = await asyncio.to_thread(get_snapshot_index, session_id)
+            if index is None:
+                raise
+            logging.warning(f"Qdrant search failed, searching the snapshot of {session_id}: {str(e)}")
+            candidates = await asyncio.to_thread(index.search, query_vector, limit)
+            relevance = None
+
+        reranker = await load_off_loop(get_reranker) if candidates else None
+        if reranker is not None:
+            relevance = await asyncio.to_thread(
+                reranker.score, query, [result.payload['content'] for result in candidates]
+            )
+        return candidates, relevance
 
     def _create_prompt(self, query: str, contexts: List[str]) -> str:
         """Create a prompt with retrieved context"""
@@ -69,55 +193,76 @@ A:"""
     async def get_response(self, query: str, session_id : str) -> str:
         """Get response from Mistral AI using RAG"""
         try:
+            # Near-identical questions against the same corpus reuse the earlier answer
+            cached, query_vector, version = await self._cached_answer(query, session_id)
+            if cached:
+                return cached.answer
+
             # Get relevant context from vector store
-            contexts = self._get_relevant_context(query, session_id=session_id)
+            contexts, sources = await self._get_relevant_context(query, session_id=session_id, query_vector=query_vector)
             
             if not contexts:
                 return "I couldn't find any relevant information to answer your question."
             
             # Create messages for chat completion
-            messages = [ 
-                SystemMessage(content = "You are a helpful assistant that answers questions based on the provided context"),
-                UserMessage(content = self._create_prompt(query, contexts))
-            ]
+            client = await self._get_client()
+            messages = _messages(self._create_prompt(query, contexts))
             
             # Get response from Mistral
-            chat_response = await self.client.chat.complete_async(
-                model=self.model_name,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=500
-            )
+            with timed("llm"):
+                chat_response = await client.chat.complete_async(
+                    model=self.model_name,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=500
+                )
             
-            return chat_response.choices[0].message.content
+            answer = chat_response.choices[0].message.content
+            if self.answer_cache and answer:
+                self.answer_cache.put(session_id, version, query_vector, query, answer, sources)
+            return answer
             
         except Exception as e:
             return f"An error occurred: {str(e)}"
 
-    async def stream_response(self, query: str):
-        """Stream response from Mistral AI using RAG"""
-        try:
-            contexts = self._get_relevant_context(query)
-            
-            if not contexts:
-                yield "I couldn't find any relevant information to answer your question."
-                return
-            
-            messages = [ 
-                SystemMessage(content = "You are a helpful assistant that answers questions based on the provided context"),
-                UserMessage(content = self._create_prompt(query, contexts))
-            ]
-            
-            stream = await self.client.chat.stream_async(
+    async def stream_response(self, query: str, session_id : str, meta: dict = None):
+        """
+        Stream response deltas from Mistral AI using RAG. Errors are raised,
+        not yielded, so the caller can end the stream as failed.
+        meta, when given, is filled with the answer's source urls and whether it came from the cache.
+        """
+        meta = {} if meta is None else meta
+        cached, query_vector, version = await self._cached_answer(query, session_id)
+        if cached:
+            meta.update(sources=cached.sources, cached=True)
+            yield cached.answer
+            return
+
+        contexts, sources = await self._get_relevant_context(query, session_id=session_id, query_vector=query_vector)
+        meta.update(sources=sources, cached=False)
+        
+        if not contexts:
+            yield "I couldn't find any relevant information to answer your question."
+            return
+        
+        client = await self._get_client()
+        messages = _messages(self._create_prompt(query, contexts))
+        
+        # Closing the stream on exit drops the HTTP response if the turn is cancelled
+        parts = []
+        with timed("llm_stream"):
+            stream = await client.chat.stream_async(
                 model=self.model_name,
                 messages=messages,
                 temperature=0.7,
                 max_tokens=500
             )
-            
-            async for chunk in stream:
-                if chunk.data.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content
-                    
-        except Exception as e:
-            yield f"An error occurred: {str(e)}"
\ No newline at end of file
+            async with stream:
+                async for chunk in stream:
+                    if chunk.data.choices[0].delta.content:
+                        parts.append(chunk.data.choices[0].delta.content)
+                        yield chunk.data.choices[0].delta.content
+
+        # Only answers that streamed to completion are cached
+        if self.answer_cache and parts:
+            self.answer_cache.put(session_id, version, query_vector, query, "".join(parts), sources)
@@ -0,0 +1,106 @@
+import itertools
+import time
+from collections import Counter, OrderedDict, defaultdict
+from functools import lru_cache
+from threading import Lock
+from typing import List, NamedTuple
+import numpy as np
+from config.config import settings
+
+
+class CachedAnswer(NamedTuple):
+    answer: str
+    sources: List[str]
+    query: str
+    score: float
+
+
+class AnswerCache:
+    """
+    Answers to earlier questions, per session and corpus version.
+    A lookup hits when a cached question's embedding is within threshold
+    cosine similarity of the new one. Entries expire after ttl seconds,
+    the least recently used go first once max_entries is reached, and
+    invalidate() drops a session's answers when its corpus is re-ingested.
+    """
+
+    def __init__(self, max_entries: int = None, ttl: float = None, threshold: float = None):
+        self.max_entries = max_entries or settings.ANSWER_CACHE_SIZE
+        self.ttl = ttl or settings.ANSWER_CACHE_TTL
+        self.threshold = settings.ANSWER_CACHE_THRESHOLD if threshold is None else threshold
+        self._entries = OrderedDict()  # entry id -> (session_id, version, vector, answer, expires_at)
+        self._by_session = defaultdict(set)
+        self._versions = Counter()
+        self._ids = itertools.count()
+        self._lock = Lock()
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def version(self, session_id) -> int:
+        """Current corpus version, read it before retrieval and pass it to put()"""
+        with self._lock:
+            return self._versions[session_id]
+
+    def _drop(self, entry_id):
+        session_id = self._entries.pop(entry_id)[0]
+        self._by_session[session_id].discard(entry_id)
+        if not self._by_session[session_id]:
+            del self._by_session[session_id]
+
+    def get(self, session_id, query_vector) -> CachedAnswer | None:
+        query_vector = self._normalize(query_vector)
+        now = time.monotonic()
+        with self._lock:
+            version = self._versions[session_id]
+            best_id, best_score = None, self.threshold
+            for entry_id in list(self._by_session.get(session_id, ())):
+                _, entry_version, vector, _, expires_at = self._entries[entry_id]
+                if entry_version != version or expires_at <= now:
+                    self._drop(entry_id)
+                    continue
+                score = float(np.dot(vector, query_vector))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is None:
+                return None
+            self._entries.move_to_end(best_id)
+            answer = self._entries[best_id][3]
+            return answer._replace(score=best_score)
+
+    def put(self, session_id, version: int, query_vector, query: str, answer: str, sources: List[str]):
+        """Store an answer, ignored if the corpus was re-ingested since version was read"""
+        vector = self._normalize(query_vector)
+        with self._lock:
+            if version != self._versions[session_id]:
+                return
+            entry_id = next(self._ids)
+            cached = CachedAnswer(answer, list(sources), query, 1.0)
+            self._entries[entry_id] = (session_id, version, vector, cached, time.monotonic() + self.ttl)
+            self._by_session[session_id].add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, session_id):
+        """Forget a session's answers, its corpus has changed"""
+        with self._lock:
+            self._versions[session_id] += 1
+            for entry_id in list(self._by_session.get(session_id, ())):
+                self._drop(entry_id)
+
+
+@lru_cache(maxsize=1)
+def get_answer_cache() -> AnswerCache | None:
+    if not settings.ANSWER_CACHE_ENABLED:
+        return None
+    return AnswerCache()
+
+
+def invalidate_answers(session_id: str):
+    """Drop a session's cached answers after its corpus changed"""
+    answer_cache = get_answer_cache()
+    if answer_cache is not None:
+        answer_cache.invalidate(session_id)
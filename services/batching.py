@@ -0,0 +1,67 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+
+class Batcher:
+    """
+    Collects items submitted one at a time from many threads and tasks into
+    batches. The first item opens a batch that closes after max_wait_ms or
+    once max_batch units are collected, whichever comes first, and
+    handle(items, futures) runs on the batcher thread. handle resolves the
+    futures, now or later; if it raises, the unresolved ones get the error.
+    size(item) is how many units an item counts for, 1 by default.
+    """
+
+    def __init__(self, handle: Callable[[List, List[Future]], None], max_batch: int, max_wait_ms: float,
+                 size: Callable = None, name: str = "batcher"):
+        self.handle = handle
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.size = size or (lambda item: 1)
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, item) -> Future:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def _collect(self):
+        pending = [self._queue.get()]
+        count = self.size(pending[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while count < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(entry)
+            count += self.size(entry[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            futures = [future for _, future in pending]
+            try:
+                self.handle([item for item, _ in pending], futures)
+            except Exception as e:
+                logger.error(f"{self.name} batch of {len(pending)} failed: {str(e)}")
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
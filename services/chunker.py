@@ -0,0 +1,133 @@
+import logging
+import re
+from functools import lru_cache
+from typing import List
+from config.config import settings
+
+logger = logging.getLogger(__name__)
+
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.*)$")
+WORD_RE = re.compile(r"\w+|[^\w\s]")
+
+
+@lru_cache(maxsize=1)
+def _get_tokenizer():
+    """Load the embedding model's fast (Rust) tokenizer, None if unavailable"""
+    try:
+        from tokenizers import Tokenizer
+        tokenizer = Tokenizer.from_pretrained(settings.EMBEDDING_MODEL)
+    except Exception as e:
+        logger.warning(f"Fast tokenizer unavailable, using regex estimate: {str(e)}")
+        return None
+
+    # tokenizer.json ships the model's truncation and fixed-length padding, which
+    # would make every text count as exactly that many tokens
+    tokenizer.no_truncation()
+    tokenizer.no_padding()
+    if len(tokenizer.encode(" ".join(["word"] * 500), add_special_tokens=False).offsets) <= 256:
+        logger.warning("Tokenizer still caps its output, using regex estimate")
+        return None
+    return tokenizer
+
+
+def token_spans(text: str) -> List[tuple[int, int]]:
+    """Character offsets of each token in text"""
+    tokenizer = _get_tokenizer()
+    if tokenizer is not None:
+        return tokenizer.encode(text, add_special_tokens=False).offsets
+    return [match.span() for match in WORD_RE.finditer(text)]
+
+
+def count_tokens(text: str) -> int:
+    return len(token_spans(text))
+
+
+def _blocks(content: str):
+    """Yield (heading_path, start, end) for each paragraph, tracking headings"""
+    heading_path = []
+    offset = 0
+    fence_start = None
+    for line in content.split("\n"):
+        start, end = offset, offset + len(line)
+        offset = end + 1
+        # A fenced code block is one paragraph, and "#" lines inside it are not headings
+        if fence_start is not None:
+            if line.startswith("```"):
+                yield tuple(heading_path), fence_start, end
+                fence_start = None
+            continue
+        if line.startswith("```"):
+            fence_start = start
+            continue
+        if not line.strip():
+            continue
+        heading = HEADING_RE.match(line)
+        if heading:
+            level = len(heading.group(1))
+            heading_path = heading_path[:level - 1] + [heading.group(2).strip()]
+            continue
+        yield tuple(heading_path), start, end
+    if fence_start is not None:
+        yield tuple(heading_path), fence_start, len(content)
+
+
+def _split_long_block(content, start, end, window, overlap):
+    """Cut an oversized paragraph into window-sized token slices"""
+    spans = token_spans(content[start:end])
+    step = max(window - overlap, 1)
+    for i in range(0, len(spans), step):
+        piece = spans[i:i + window]
+        yield start + piece[0][0], start + piece[-1][1], len(piece)
+        if i + window >= len(spans):
+            break
+
+
+def chunk_document(content: str, window: int = None, overlap: int = None) -> List[dict]:
+    """
+    Split page content into passages of at most window tokens.
+    Chunks never cross a heading and break on paragraph boundaries, carrying
+    up to overlap tokens of trailing paragraphs into the next chunk.
+    Each chunk records its character offsets and heading path.
+    """
+    window = window or settings.CHUNK_TOKENS
+    overlap = settings.CHUNK_OVERLAP if overlap is None else overlap
+
+    chunks = []
+    current = []  # [(start, end, tokens)]
+    current_path = None
+
+    def flush():
+        if current:
+            start, end = current[0][0], current[-1][1]
+            chunks.append({
+                "chunk_index": len(chunks),
+                "content": content[start:end],
+                "start": start,
+                "end": end,
+                "heading_path": list(current_path or ()),
+            })
+
+    for heading_path, start, end in _blocks(content):
+        if heading_path != current_path:
+            flush()
+            current, current_path = [], heading_path
+
+        pieces = [(start, end, count_tokens(content[start:end]))]
+        if pieces[0][2] > window:
+            pieces = list(_split_long_block(content, start, end, window, overlap))
+
+        for piece in pieces:
+            if current and sum(tokens for _, _, tokens in current) + piece[2] > window:
+                flush()
+                # Carry trailing paragraphs forward as overlap
+                carried, carried_tokens = [], 0
+                for block in reversed(current):
+                    if carried_tokens + block[2] > overlap or carried_tokens + block[2] + piece[2] > window:
+                        break
+                    carried.insert(0, block)
+                    carried_tokens += block[2]
+                current = carried
+            current.append(piece)
+
+    flush()
+    return chunks
@@ -0,0 +1,80 @@
+from typing import List, Sequence
+import numpy as np
+from config.config import settings
+from services.chunker import token_spans
+
+
+def _normalize_rows(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def mmr_select(query_vector, vectors: Sequence, k: int, lambda_: float = None,
+               duplicate_threshold: float = None, relevance: Sequence[float] = None) -> List[int]:
+    """
+    Maximal Marginal Relevance: pick up to k indices trading relevance to the
+    query against similarity to what is already picked. Candidates at least
+    duplicate_threshold similar to a picked one are dropped outright.
+    relevance overrides the cosine to query_vector (e.g. fused or reranker
+    scores), it is min-max scaled to [0, 1] first.
+    Returns indices in pick order, most relevant first.
+    """
+    lambda_ = settings.MMR_LAMBDA if lambda_ is None else lambda_
+    duplicate_threshold = settings.CONTEXT_DEDUP_THRESHOLD if duplicate_threshold is None else duplicate_threshold
+    if not len(vectors) or k <= 0:
+        return []
+
+    matrix = _normalize_rows(vectors)
+    if relevance is None:
+        relevance = matrix @ _normalize_rows(query_vector)
+    else:
+        relevance = np.asarray(relevance, dtype=np.float32)
+        spread = relevance.max() - relevance.min()
+        relevance = (relevance - relevance.min()) / spread if spread else np.ones_like(relevance)
+    similarity = matrix @ matrix.T
+
+    selected = []
+    redundancy = np.zeros(len(matrix), dtype=np.float32)  # max similarity to anything selected
+    available = np.ones(len(matrix), dtype=bool)
+    while len(selected) < k and available.any():
+        scores = lambda_ * relevance - (1 - lambda_) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+        available &= redundancy < duplicate_threshold
+    return selected
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text after max_tokens tokens, at a token boundary"""
+    spans = token_spans(text)
+    if len(spans) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    return text[:spans[max_tokens - 1][1]].rstrip() + "..."
+
+
+def pack_passages(passages: List[dict], budget: int = None, min_tokens: int = None) -> List[dict]:
+    """
+    Fit passages ({"content", "url", ...} in relevance order) into a token budget.
+    The last passage that fits is truncated, rather than dropped, if at least
+    min_tokens of it can be kept.
+    """
+    budget = budget or settings.CONTEXT_TOKEN_BUDGET
+    min_tokens = settings.CONTEXT_MIN_PASSAGE_TOKENS if min_tokens is None else min_tokens
+
+    packed = []
+    remaining = budget
+    for passage in passages:
+        tokens = len(token_spans(passage["content"]))
+        if tokens > remaining:
+            if remaining >= min_tokens:
+                packed.append({**passage, "content": truncate_to_tokens(passage["content"], remaining)})
+            break
+        packed.append(passage)
+        remaining -= tokens
+    return packed
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Mapping, NamedTuple
+from urllib.parse import urlparse
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from config.config import settings
+from services.metrics import instrument
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "SmartAgent/1.0 (+https://github.com/Kaniac04/SmartAgent)"
+HTML_CONTENT_TYPES = {"text/html", "application/xhtml+xml"}
+
+
+class UnsupportedContent(Exception):
+    """The response is not an HTML page"""
+
+
+class FetchedPage(NamedTuple):
+    status_code: int
+    headers: Mapping
+    text: str
+    url: str  # final URL after redirects, the base for the page's relative links
+
+
+def check_content_type(url, headers):
+    content_type = headers.get("Content-Type", "").split(";")[0].strip().lower()
+    if content_type and content_type not in HTML_CONTENT_TYPES:
+        raise UnsupportedContent(f"Skipping {url}: content type {content_type}")
+
+
+def _decode(body: bytes, encoding: str = None) -> str:
+    try:
+        return body.decode(encoding or "utf-8", errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+
+http_session = requests.Session()
+http_session.headers.update({"User-Agent": USER_AGENT})
+http_session.mount("http://", HTTPAdapter(pool_maxsize=settings.CRAWL_CONCURRENCY))
+http_session.mount("https://", HTTPAdapter(pool_maxsize=settings.CRAWL_CONCURRENCY))
+
+
+@instrument("fetch")
+def fetch_page(url: str, headers: dict = None) -> FetchedPage:
+    """Blocking fetch over the pooled keep-alive session, same limits as AsyncCrawler.fetch"""
+    with http_session.get(url, headers=headers, timeout=settings.CRAWL_TIMEOUT, stream=True) as response:
+        if response.status_code == 304:
+            return FetchedPage(304, response.headers, "", str(response.url))
+        response.raise_for_status()
+        check_content_type(url, response.headers)
+
+        body = bytearray()
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            body.extend(chunk)
+            if len(body) >= settings.CRAWL_MAX_BYTES:
+                logger.warning(f"Truncated {url} at {settings.CRAWL_MAX_BYTES} bytes")
+                break
+        # requests falls back to ISO-8859-1 without a charset, most pages are UTF-8
+        has_charset = "charset=" in response.headers.get("Content-Type", "").lower()
+        return FetchedPage(response.status_code, response.headers,
+                           _decode(body[:settings.CRAWL_MAX_BYTES], response.encoding if has_charset else None),
+                           response.url)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class AsyncCrawler:
+    """Pooled keep-alive HTTP client with a global and a per-host concurrency cap"""
+
+    def __init__(self, concurrency: int = None, per_host: int = None,
+                 http2: bool = None, timeout: float = None):
+        self.concurrency = concurrency or settings.CRAWL_CONCURRENCY
+        self.per_host = per_host or settings.CRAWL_PER_HOST_CONCURRENCY
+        self.timeout = timeout or settings.CRAWL_TIMEOUT
+        self.http2 = settings.CRAWL_HTTP2 if http2 is None else http2
+        if self.http2 and not _http2_available():
+            logger.warning("HTTP/2 requested but 'h2' is not installed, falling back to HTTP/1.1")
+            self.http2 = False
+
+        self._global = asyncio.Semaphore(self.concurrency)
+        self._hosts = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+        self._client = None
+
+    async def __aenter__(self):
+        # httpx negotiates gzip/deflate (and brotli when installed) by default
+        self._client = httpx.AsyncClient(
+            http2=self.http2,
+            timeout=self.timeout,
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(
+                max_connections=self.concurrency,
+                max_keepalive_connections=self.concurrency,
+            ),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._client.aclose()
+        self._client = None
+
+    @instrument("fetch")
+    async def fetch(self, url: str, headers: dict = None) -> FetchedPage:
+        """GET a page, waiting for both a per-host and a global slot. 304s are returned, not raised"""
+        host = urlparse(url).netloc
+        # Host slot first, so a task queued behind a busy host does not sit on a global slot
+        async with self._hosts[host], self._global:
+            async with self._client.stream("GET", url, headers=headers) as response:
+                if response.status_code == 304:
+                    return FetchedPage(304, response.headers, "", str(response.url))
+                response.raise_for_status()
+                check_content_type(url, response.headers)
+
+                body = bytearray()
+                async for chunk in response.aiter_bytes():
+                    body.extend(chunk)
+                    if len(body) >= settings.CRAWL_MAX_BYTES:
+                        logger.warning(f"Truncated {url} at {settings.CRAWL_MAX_BYTES} bytes")
+                        break
+                return FetchedPage(response.status_code, response.headers,
+                                   _decode(body[:settings.CRAWL_MAX_BYTES], response.encoding), str(response.url))
@@ -0,0 +1,137 @@
+import logging
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import List
+from config.config import settings
+from services.batching import Batcher
+
+logger = logging.getLogger(__name__)
+
+
+def _variant_name(model_name: str, onnx: bool, quantize: bool) -> str:
+    # Quantized/ONNX variants produce slightly different vectors, cache them separately
+    return model_name + (":onnx" if onnx else "") + (":int8" if quantize else "")
+
+
+def cache_name() -> str:
+    """Cache namespace of the configured backend, known without loading the model"""
+    if settings.EMBEDDING_BACKEND == "local":
+        return _variant_name(settings.EMBEDDING_MODEL, settings.EMBEDDING_ONNX, settings.EMBEDDING_QUANTIZE)
+    return settings.EMBEDDING_MODEL
+
+
+class InferenceAPIBackend:
+    """Embeddings from the Hugging Face Inference API"""
+
+    def __init__(self, model_name: str):
+        from huggingface_hub import InferenceClient
+        self.model_name = model_name
+        self.cache_name = model_name
+        self.client = InferenceClient(token=settings.HF_API_KEY)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        # The API accepts both single strings and lists of strings
+        embeddings = self.client.feature_extraction(texts, model=self.model_name)
+        return embeddings.tolist() if hasattr(embeddings, "tolist") else embeddings
+
+
+class LocalBackend:
+    """In-process sentence-transformers model, optionally ONNX and/or int8 quantized"""
+
+    def __init__(self, model_name: str, device: str = "cpu", onnx: bool = False, quantize: bool = False):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.cache_name = _variant_name(model_name, onnx, quantize)
+
+        if onnx:
+            file_name = "onnx/model_qint8_avx2.onnx" if quantize else "onnx/model.onnx"
+            self.model = SentenceTransformer(model_name, device=device, backend="onnx",
+                                             model_kwargs={"file_name": file_name})
+        else:
+            self.model = SentenceTransformer(model_name, device=device)
+            if quantize:
+                import torch
+                self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        logger.info(f"Loaded local embedding model {model_name} (onnx={onnx}, int8={quantize})")
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return self.model.encode(
+            texts,
+            batch_size=settings.EMBEDDING_MAX_BATCH,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        ).tolist()
+
+
+@lru_cache(maxsize=1)
+def get_backend():
+    """Build the configured embedding backend once per process"""
+    if settings.EMBEDDING_BACKEND == "local":
+        return LocalBackend(
+            settings.EMBEDDING_MODEL,
+            device=settings.EMBEDDING_DEVICE,
+            onnx=settings.EMBEDDING_ONNX,
+            quantize=settings.EMBEDDING_QUANTIZE,
+        )
+    if settings.EMBEDDING_BACKEND == "api":
+        return InferenceAPIBackend(settings.EMBEDDING_MODEL)
+    raise ValueError(f"Unknown embedding backend: {settings.EMBEDDING_BACKEND}")
+
+
+class Reranker:
+    """Local cross-encoder that rescores (query, passage) pairs, small enough for CPU"""
+
+    def __init__(self, model_name: str, device: str = "cpu"):
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name, device=device)
+        logger.info(f"Loaded reranker {model_name}")
+
+    def score(self, query: str, passages: List[str]) -> List[float]:
+        return self.model.predict([(query, passage) for passage in passages], convert_to_numpy=True).tolist()
+
+
+@lru_cache(maxsize=1)
+def get_reranker() -> Reranker | None:
+    if not settings.RERANKER_MODEL:
+        return None
+    try:
+        return Reranker(settings.RERANKER_MODEL, device=settings.EMBEDDING_DEVICE)
+    except Exception as e:
+        logger.error(f"Reranker unavailable, using fused ranking: {str(e)}")
+        return None
+
+
+class MicroBatcher:
+    """
+    Merges concurrent embedding calls into a single forward pass.
+    The first request opens a batch that closes after max_wait_ms or once
+    max_batch texts are collected, whichever comes first.
+    """
+
+    def __init__(self, backend, max_batch: int = None, max_wait_ms: float = None):
+        self.backend = backend
+        self._batcher = Batcher(
+            self._embed_batch,
+            max_batch or settings.EMBEDDING_MAX_BATCH,
+            settings.EMBEDDING_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms,
+            size=len,
+            name="embedding-batcher",
+        )
+
+    def submit(self, texts: List[str]) -> Future:
+        return self._batcher.submit(texts)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return self.submit(texts).result()
+
+    def _embed_batch(self, batches: List[List[str]], futures: List[Future]):
+        vectors = self.backend.embed([text for texts in batches for text in texts])
+        offset = 0
+        for texts, future in zip(batches, futures):
+            future.set_result(vectors[offset:offset + len(texts)])
+            offset += len(texts)
+
+
+@lru_cache(maxsize=1)
+def get_batcher() -> MicroBatcher:
+    return MicroBatcher(get_backend())
@@ -0,0 +1,315 @@
+import hashlib
+import logging
+import re
+from functools import lru_cache
+from typing import List
+from urllib.parse import urlparse
+from config.config import settings
+from services.frontier import normalize_url
+from services.metrics import instrument
+
+logger = logging.getLogger(__name__)
+
+# Never contain readable text or links
+DROP_TAGS = {"script", "style", "noscript", "template", "svg", "canvas", "iframe", "object"}
+# Site chrome: links are still followed, text is not indexed. Not <form>: ASP.NET
+# WebForms and many doc sites wrap the whole page, main content included, in one
+BOILERPLATE_TAGS = {"nav", "aside", "button", "select", "dialog"}
+BOILERPLATE_ROLES = {"navigation", "banner", "contentinfo", "complementary", "search", "menu"}
+BOILERPLATE_HINT = re.compile(r"(^|[\s_-])(nav|navbar|menu|sidebar|breadcrumbs?|cookie|toc)([\s_-]|$)", re.I)
+# Page chrome outside the main content, but article and section headers inside it
+PAGE_CHROME_TAGS = {"header", "footer"}
+PAGE_CHROME_HINT = re.compile(r"(^|[\s_-])(footer|header)([\s_-]|$)", re.I)
+CONTENT_TAGS = {"main", "article"}
+
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "li", "ul", "ol", "dl", "dt", "dd", "blockquote",
+    "table", "thead", "tbody", "tr", "figure", "figcaption", "details", "summary", "br", "hr",
+    "h1", "h2", "h3", "h4", "h5", "h6",
+}
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+
+
+class _BlockBuilder:
+    """
+    Turns a stream of start/text/end events into text blocks in one pass.
+    Headings become markdown "#" lines, list items "- " lines, table rows
+    "a | b" lines and <pre> blocks fenced code, so the chunker sees structure.
+    """
+
+    def __init__(self):
+        self.blocks = []
+        self.links = []
+        self.title = None
+        self._buffer = []
+        self._prefix = ""
+        self._skip = 0       # depth inside boilerplate
+        self._soft = False   # the boilerplate was only matched by a header/footer class hint, headings are kept
+        self._rescue = 0     # depth inside a heading kept from such boilerplate
+        self._content = 0    # depth inside main/article
+        self._drop = 0       # depth inside script/style
+        self._pre = 0        # depth inside <pre>
+        self._in_title = False
+        self._title_parts = []
+        self._cells = 0
+
+    def _flush(self):
+        text = " ".join("".join(self._buffer).split())
+        if text:
+            self.blocks.append(self._prefix + text)
+        self._buffer = []
+        self._prefix = ""
+        self._cells = 0
+
+    def start(self, tag, attrs):
+        if tag == "a" and attrs.get("href"):
+            self.links.append(attrs["href"])
+        if self._drop or tag in DROP_TAGS:
+            self._drop += 1
+            return
+        if tag == "title":
+            self._in_title = True
+            return
+        if self._skip:
+            self._skip += 1
+            if self._rescue:
+                self._rescue += 1
+            elif self._soft and tag in HEADING_TAGS:
+                self._start_heading(tag)
+                self._rescue = 1
+            return
+        boilerplate = self._is_boilerplate(tag, attrs)
+        if boilerplate:
+            self._skip = 1
+            self._soft = boilerplate == "hint"
+            return
+
+        if tag in CONTENT_TAGS:
+            self._content += 1
+        if tag == "pre":
+            if not self._pre:
+                self._flush()
+            self._pre += 1
+            return
+        if self._pre:
+            return
+        if tag in HEADING_TAGS:
+            self._start_heading(tag)
+        elif tag in BLOCK_TAGS:
+            self._flush()
+            if tag == "li":
+                self._prefix = "- "
+        elif tag in ("td", "th"):
+            if self._cells:
+                self._buffer.append(" | ")
+            self._cells += 1
+
+    def _start_heading(self, tag):
+        self._flush()
+        self._prefix = "#" * int(tag[1]) + " "
+
+    def text(self, data):
+        if self._drop:
+            return
+        if self._in_title:
+            self._title_parts.append(data)
+            return
+        if self._skip and not self._rescue:
+            return
+        self._buffer.append(data)
+
+    def end(self, tag):
+        if self._drop:
+            self._drop -= 1
+            return
+        if tag == "title":
+            self._in_title = False
+            self.title = " ".join("".join(self._title_parts).split()) or None
+            return
+        if self._skip:
+            self._skip -= 1
+            if self._rescue:
+                self._rescue -= 1
+                if not self._rescue:
+                    self._flush()
+            return
+
+        if tag in CONTENT_TAGS:
+            self._content -= 1
+        if tag == "pre":
+            self._pre -= 1
+            if not self._pre:
+                code = "".join(self._buffer).strip("\n")
+                if code.strip():
+                    self.blocks.append(f"```\n{code}\n```")
+                self._buffer = []
+            return
+        if self._pre:
+            return
+        if tag in BLOCK_TAGS:
+            self._flush()
+
+    def finish(self):
+        self._flush()
+        return self
+
+    def _is_boilerplate(self, tag, attrs):
+        """True for site chrome, "hint" when only a header/footer id/class suggests it, False for content"""
+        if tag in BOILERPLATE_TAGS or (tag in PAGE_CHROME_TAGS and not self._content):
+            return True
+        if attrs.get("role") in BOILERPLATE_ROLES or attrs.get("aria-hidden") == "true":
+            return True
+        if tag in ("div", "section", "ul"):
+            hint = f"{attrs.get('id') or ''} {attrs.get('class') or ''}"
+            if BOILERPLATE_HINT.search(hint):
+                return True
+            if not self._content and PAGE_CHROME_HINT.search(hint):
+                # Themes put page and section titles in div.section-header, keep their headings
+                return "hint"
+        return False
+
+
+class LxmlExtractor:
+    name = "lxml"
+
+    def __init__(self):
+        import lxml.html
+        from lxml import etree
+        self._html = lxml.html
+        self._etree = etree
+
+    def extract(self, html: str) -> _BlockBuilder:
+        builder = _BlockBuilder()
+        try:
+            root = self._html.document_fromstring(html)
+        except ValueError:
+            # lxml refuses str input that carries an XML encoding declaration
+            root = self._html.document_fromstring(html.encode("utf-8"))
+        except self._etree.ParserError:
+            return builder.finish()
+        for action, element in self._etree.iterwalk(root, events=("start", "end")):
+            tag = element.tag if isinstance(element.tag, str) else None
+            if action == "start":
+                if tag:
+                    builder.start(tag.lower(), element.attrib)
+                    if element.text:
+                        builder.text(element.text)
+            else:
+                if tag:
+                    builder.end(tag.lower())
+                if element.tail:
+                    builder.text(element.tail)
+        return builder.finish()
+
+
+class SelectolaxExtractor:
+    name = "selectolax"
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+        self._parser = LexborHTMLParser
+
+    def extract(self, html: str) -> _BlockBuilder:
+        builder = _BlockBuilder()
+        root = self._parser(html).root
+        if root is None:
+            return builder.finish()
+        # Iterative walk, deep documentation pages can exceed the recursion limit
+        stack = [(root, False)]
+        while stack:
+            node, closing = stack.pop()
+            if closing:
+                builder.end(node.tag)
+                continue
+            if node.tag == "-text":
+                builder.text(node.text_content or "")
+                continue
+            if node.tag.startswith(("-", "_", "!")):
+                continue
+            builder.start(node.tag, {key: value or "" for key, value in node.attributes.items()})
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(list(node.iter(include_text=True))))
+        return builder.finish()
+
+
+class SoupExtractor:
+    """Pure-python fallback on BeautifulSoup's html.parser"""
+    name = "html.parser"
+
+    def __init__(self):
+        from bs4 import BeautifulSoup, NavigableString, Comment, Doctype
+        self._soup = BeautifulSoup
+        self._string = NavigableString
+        self._skip_strings = (Comment, Doctype)
+
+    def extract(self, html: str) -> _BlockBuilder:
+        builder = _BlockBuilder()
+        stack = [(self._soup(html, "html.parser"), False)]
+        while stack:
+            node, closing = stack.pop()
+            if closing:
+                builder.end(node.name)
+                continue
+            if isinstance(node, self._string):
+                if not isinstance(node, self._skip_strings):
+                    builder.text(str(node))
+                continue
+            if node.name != "[document]":
+                attrs = {key: " ".join(value) if isinstance(value, list) else value for key, value in node.attrs.items()}
+                builder.start(node.name, attrs)
+                stack.append((node, True))
+            stack.extend((child, False) for child in reversed(node.contents))
+        return builder.finish()
+
+
+EXTRACTORS = {
+    "selectolax": SelectolaxExtractor,
+    "lxml": LxmlExtractor,
+    "html.parser": SoupExtractor,
+}
+
+
+@lru_cache(maxsize=1)
+def get_extractor():
+    """The configured extractor, or the fastest one installed for "auto" """
+    names = list(EXTRACTORS) if settings.HTML_PARSER == "auto" else [settings.HTML_PARSER]
+    for name in names:
+        try:
+            extractor = EXTRACTORS[name]()
+            logger.info(f"Using {name} HTML extractor")
+            return extractor
+        except ImportError:
+            continue
+    raise RuntimeError(f"No HTML extractor available for {settings.HTML_PARSER}")
+
+
+def extract(html: str) -> tuple[str, str, List[str]]:
+    """Returns (title, text content, raw hrefs) of an HTML page"""
+    result = get_extractor().extract(html)
+    return result.title or "No Title", "\n".join(result.blocks), result.links
+
+
+@instrument("parse")
+def parse_page(url, html, domain, base=None):
+    """
+    Extract the document and same-domain links from a fetched page. Links are
+    resolved against base, the URL that was served after redirects, or url.
+    """
+    title, text_content, hrefs = extract(html)
+
+    # Collect links, the frontier canonicalizes and dedups them
+    new_urls = []
+    for href in hrefs:
+        try:
+            absolute_url = normalize_url(href, base=base or url)
+            if absolute_url and urlparse(absolute_url).netloc == domain:
+                new_urls.append(absolute_url)
+        except Exception as e:
+            logger.error(f"Error processing link {href}: {str(e)}")
+            continue
+
+    return {"url": url, "title": title, "content": text_content}, new_urls
+
+
+def content_hash(document):
+    return hashlib.sha256(f"{document['title']}\n{document['content']}".encode("utf-8")).hexdigest()
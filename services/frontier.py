@@ -0,0 +1,102 @@
+import heapq
+import itertools
+from threading import Lock
+from urllib.parse import urljoin, urlparse, urlunparse, parse_qsl, urlencode
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str, base: str = None) -> str | None:
+    """
+    Absolute form of a URL that is safe to fetch: resolves relative paths
+    against base, drops the fragment and default port and lowercases
+    scheme/host, but keeps the path and query as the server wrote them.
+    Returns None for anything that is not http(s).
+    """
+    if base:
+        url = urljoin(base, url)
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parsed.hostname:
+        return None
+
+    netloc = parsed.hostname.lower()
+    if parsed.port and parsed.port != DEFAULT_PORTS[scheme]:
+        netloc = f"{netloc}:{parsed.port}"
+    return urlunparse((scheme, netloc, parsed.path or "/", parsed.params, parsed.query, ""))
+
+
+def canonicalize_url(url: str, base: str = None) -> str | None:
+    """
+    Normalize a URL so equivalent links dedup to the same key.
+    On top of normalize_url, strips trailing slashes and sorts the query.
+    Only a dedup key: /guide and /guide/ can be different pages, and relative
+    links must be resolved against the URL that was actually served.
+    """
+    url = normalize_url(url, base)
+    if url is None:
+        return None
+    parsed = urlparse(url)
+
+    path = parsed.path
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/") or "/"
+
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return urlunparse((parsed.scheme, parsed.netloc, path, parsed.params, query, ""))
+
+
+class URLFrontier:
+    """
+    Priority queue of URLs still to crawl for a single domain.
+    URLs are deduplicated on their canonical form at enqueue time, so every
+    URL is handed out at most once, in the normalized form it was linked
+    with. Shallow, short, query-free URLs go first.
+    """
+
+    def __init__(self, domain: str, max_depth: int = None):
+        self.domain = domain.lower()
+        self.max_depth = max_depth
+        self._heap = []
+        self._seen = set()
+        self._counter = itertools.count()
+        self._lock = Lock()
+
+    @staticmethod
+    def score(url: str, depth: int) -> int:
+        """Lower is crawled first"""
+        parsed = urlparse(url)
+        path_depth = len([part for part in parsed.path.split("/") if part])
+        return depth * 10 + path_depth + (5 if parsed.query else 0)
+
+    def push(self, url: str, depth: int = 0, base: str = None) -> bool:
+        """Enqueue a URL, returns False if it is off-domain, too deep or already seen"""
+        if self.max_depth is not None and depth > self.max_depth:
+            return False
+        url = normalize_url(url, base)
+        if url is None or urlparse(url).netloc != self.domain:
+            return False
+        canonical = canonicalize_url(url)
+
+        with self._lock:
+            if canonical in self._seen:
+                return False
+            self._seen.add(canonical)
+            heapq.heappush(self._heap, (self.score(url, depth), next(self._counter), url, depth))
+        return True
+
+    def pop(self) -> tuple[str, int] | None:
+        """Return the next (url, depth) pair, or None when the frontier is empty"""
+        with self._lock:
+            if not self._heap:
+                return None
+            _, _, url, depth = heapq.heappop(self._heap)
+            return url, depth
+
+    def __len__(self):
+        with self._lock:
+            return len(self._heap)
+
+    def __contains__(self, url):
+        with self._lock:
+            return canonicalize_url(url) in self._seen
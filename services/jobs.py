@@ -0,0 +1,281 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Event
+from config.config import settings
+from services.metrics import JOBS
+from services.progress import ProgressChannel
+
+logger = logging.getLogger(__name__)
+
+
+class SessionBusy(Exception):
+    """A job for this session is already queued or running"""
+
+    def __init__(self, job):
+        super().__init__(f"Session {job.session_id} is already being scraped (job {job.id})")
+        self.job = job
+
+
+class ScrapingStatus:
+    def __init__(self, on_change=None):
+        self._on_change = on_change
+        self._lock = Lock()
+        self._is_scraping = False
+        self._is_upserting = False
+        self._completed = False
+        self.current_message = "Waiting to start"
+
+    def update(self, *, scraping=None, upserting=None, completed=None, message=None):
+        with self._lock:
+            if scraping is not None:
+                self._is_scraping = scraping
+            if upserting is not None:
+                self._is_upserting = upserting
+            if completed is not None:
+                self._completed = completed
+            if message is not None:
+                self.current_message = message
+        if self._on_change:
+            self._on_change()
+
+    @property
+    def is_completed(self):
+        with self._lock:
+            return self._completed and not (self._is_scraping or self._is_upserting)
+
+# Thread-safe sets with locks
+class ThreadSafeSet:
+    def __init__(self):
+        self._set = set()
+        self._lock = Lock()
+
+    def add(self, item):
+        with self._lock:
+            self._set.add(item)
+
+    def __contains__(self, item):
+        with self._lock:
+            return item in self._set
+
+    def __len__(self):
+        with self._lock:
+            return len(self._set)
+
+    def snapshot(self):
+        with self._lock:
+            return set(self._set)
+
+
+class ScrapeJob:
+    """One ingestion run with its own dedup sets, crawl bookkeeping and progress"""
+
+    def __init__(self, url, session_id, max_workers=5, url_limit=100, mode=None, incremental=None):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.session_id = session_id
+        self.max_workers = max_workers
+        self.url_limit = url_limit
+        self.mode = mode or settings.CRAWL_MODE
+        self.incremental = settings.INCREMENTAL_CRAWL if incremental is None else incremental
+        self.created_at = time.time()
+        self.state = "queued"
+
+        self.channel = ProgressChannel(self.progress)
+        self.status = ScrapingStatus(on_change=self.channel.publish)
+        self.status.update(message="Queued")
+        self.scraped_urls = ThreadSafeSet()
+        self.failed_urls = ThreadSafeSet()
+        # Incremental re-crawl bookkeeping
+        self.unchanged_urls = ThreadSafeSet()
+        self.gone_urls = ThreadSafeSet()
+        self.error_urls = ThreadSafeSet()  # fetches that failed for other reasons, the page may still exist
+        self.unsafe_urls = ThreadSafeSet()
+        self.unindexed_urls = ThreadSafeSet()  # stored in Mongo but their chunks never reached Qdrant
+        self.page_state = {}
+        self.frontier = None
+        self.page_writer = None
+        self.budget = None
+        self.started_at = None
+        self.chunks_embedded = 0
+        self.points_upserted = 0
+        self.sparse = False  # also index BM25 sparse vectors
+
+    def publish(self):
+        """Tell progress subscribers something changed, never blocks"""
+        self.channel.publish()
+
+    def record(self, embedded: int = None, upserted: int = None):
+        """Running ingestion totals, reported by the embed/upsert stages"""
+        if embedded is not None:
+            self.chunks_embedded = embedded
+        if upserted is not None:
+            self.points_upserted = upserted
+        self.channel.publish()
+
+    def _eta_seconds(self, scraped):
+        if not self.started_at or not scraped or self.frontier is None:
+            return None
+        expected = min(self.url_limit, scraped + len(self.frontier))
+        rate = scraped / (time.time() - self.started_at)
+        return round((expected - scraped) / rate, 1)
+
+    def progress(self):
+        scraped = len(self.scraped_urls)
+        completed = self.state in ("completed", "failed") and self.status.is_completed
+        return {
+            "job_id": self.id,
+            "session_id": self.session_id,
+            "state": self.state,
+            "message": self.status.current_message,
+            "scraped": scraped,
+            "unchanged": len(self.unchanged_urls),
+            "failed": len(self.failed_urls),
+            "blocked": len(self.unsafe_urls),
+            "embedded": self.chunks_embedded,
+            "upserted": self.points_upserted,
+            "eta_seconds": None if completed else self._eta_seconds(scraped),
+            "completed": completed
+        }
+
+
+class WorkerBudget:
+    """
+    Global cap on concurrent page workers, shared fairly across running jobs.
+    A job may hold at most total // running_jobs slots (at least one), so a
+    big crawl cannot starve the jobs that start after it.
+    """
+
+    def __init__(self, total: int):
+        self.total = total
+        self._lock = Lock()
+        self._in_use = 0
+        self._per_job = Counter()
+        self._active = set()
+        self._waiters = []
+
+    def register(self, job_id):
+        with self._lock:
+            self._active.add(job_id)
+
+    def unregister(self, job_id):
+        with self._lock:
+            self._active.discard(job_id)
+            self._per_job.pop(job_id, None)
+            self._wake()
+
+    def _share(self):
+        return max(1, self.total // max(1, len(self._active)))
+
+    def _wake(self):
+        waiters, self._waiters = self._waiters, []
+        for wake in waiters:
+            wake()
+
+    def _acquire_or_wait(self, job_id, wake) -> bool:
+        with self._lock:
+            if self._in_use < self.total and self._per_job[job_id] < self._share():
+                self._in_use += 1
+                self._per_job[job_id] += 1
+                return True
+            self._waiters.append(wake)
+            return False
+
+    def acquire(self, job_id):
+        while True:
+            event = Event()
+            if self._acquire_or_wait(job_id, event.set):
+                return
+            event.wait(timeout=1.0)
+
+    async def acquire_async(self, job_id):
+        loop = asyncio.get_running_loop()
+        while True:
+            future = loop.create_future()
+
+            def wake():
+                loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+            if self._acquire_or_wait(job_id, wake):
+                return
+            try:
+                await asyncio.wait_for(future, timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+
+    def release(self, job_id):
+        with self._lock:
+            self._in_use -= 1
+            self._per_job[job_id] -= 1
+            self._wake()
+
+
+class JobScheduler:
+    """
+    Runs ScrapeJobs on a bounded pool, extra jobs wait in FIFO order.
+    One job per session at a time: a session rebuild deletes the pages and
+    points another job for it would be writing.
+    """
+
+    def __init__(self, run, max_running_jobs: int = None, worker_budget: int = None, history: int = None):
+        self._run = run
+        self.budget = WorkerBudget(worker_budget or settings.CRAWL_WORKER_BUDGET)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_running_jobs or settings.MAX_RUNNING_JOBS,
+            thread_name_prefix="scrape-job",
+        )
+        self._history = history or settings.JOB_HISTORY
+        self._jobs = OrderedDict()
+        self._lock = Lock()
+
+    def submit(self, url, session_id, **options) -> ScrapeJob:
+        """Queue a job, raises SessionBusy while another job for the session is unfinished"""
+        job = ScrapeJob(url, session_id, **options)
+        with self._lock:
+            for other in self._jobs.values():
+                if other.session_id == session_id and other.state in ("queued", "running"):
+                    raise SessionBusy(other)
+            self._jobs[job.id] = job
+            self._prune()
+        JOBS.labels("queued").inc()
+        self._executor.submit(self._execute, job)
+        return job
+
+    def _execute(self, job):
+        job.state = "running"
+        job.started_at = time.time()
+        JOBS.labels("queued").dec()
+        JOBS.labels("running").inc()
+        job.budget = self.budget
+        self.budget.register(job.id)
+        try:
+            result = self._run(job)
+            job.state = "completed" if result.get("success") else "failed"
+        except Exception as e:
+            logger.error(f"Job {job.id} crashed: {str(e)}")
+            job.state = "failed"
+            job.status.update(scraping=False, upserting=False, completed=True, message=f"Error: {str(e)}")
+        finally:
+            self.budget.unregister(job.id)
+            JOBS.labels("running").dec()
+            job.publish()
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond the history limit"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.state in ("completed", "failed")]
+        for job_id in finished[:max(0, len(self._jobs) - self._history)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id) -> ScrapeJob | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def latest_for_session(self, session_id) -> ScrapeJob | None:
+        with self._lock:
+            for job in reversed(self._jobs.values()):
+                if job.session_id == session_id:
+                    return job
+        return None
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+from config.config import settings
+from services import mongo, offload, qdrant
+from services.chunker import count_tokens
+from services.embeddings import get_batcher, get_reranker
+from services.utility import load_off_loop
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up(agent):
+    """
+    Pay the first-request costs up front: load the embedding model, reranker
+    and tokenizer, open the Mongo and Qdrant connection pools, build the
+    summarizer and start the ingestion process pool when it is enabled. Failures are
+    logged, readiness reports whatever is still unreachable.
+    """
+    steps = {
+        "embeddings": lambda: get_batcher().embed(["warm-up"]),
+        "reranker": get_reranker,
+        "tokenizer": lambda: count_tokens("warm-up"),
+        "mongo": mongo.ping,
+        "qdrant": lambda: qdrant.get_qdrant_client().get_collections(),
+        "summarizer": lambda: agent.summarizer,
+        "ingest_pool": offload.warm_up,
+    }
+    for name, step in steps.items():
+        try:
+            step()
+        except Exception as e:
+            logger.error(f"Warm-up step {name} failed: {str(e)}")
+
+
+def build_clients(agent):
+    """
+    Import the Qdrant and Mistral SDKs and build their clients, also when
+    warm-up is off: the imports take about a second and would otherwise
+    run on the event loop with the first probe or chat turn.
+    """
+    steps = {
+        "qdrant": qdrant.get_qdrant_client,
+        "qdrant_async": qdrant.get_async_qdrant_client,
+        "mistral": lambda: agent.client,
+    }
+    for name, step in steps.items():
+        try:
+            step()
+        except Exception as e:
+            logger.error(f"Building the {name} client failed: {str(e)}")
+
+
+def prepare(agent):
+    """Startup work that talks to remote services, run after the server is already accepting requests"""
+    build_clients(agent)
+    mongo.ensure_indexes()
+    if settings.STARTUP_WARMUP:
+        warm_up(agent)
+
+
+async def _check(name, call):
+    try:
+        await asyncio.wait_for(call(), timeout=settings.READINESS_TIMEOUT)
+        return name, "ok"
+    except asyncio.TimeoutError:
+        return name, "timeout"
+    except Exception as e:
+        return name, str(e)
+
+
+async def readiness() -> dict:
+    """Status of every dependency, "ok" or the reason it failed"""
+    checks = await asyncio.gather(
+        _check("mongo", lambda: asyncio.to_thread(mongo.ping)),
+        _check("qdrant", _qdrant_ready),
+    )
+    return dict(checks)
+
+
+async def _qdrant_ready():
+    # A probe that arrives before prepare() has built the client must not import the SDK on the loop
+    client = await load_off_loop(qdrant.get_async_qdrant_client)
+    await client.get_collections()
+
+
+async def shutdown():
+    await qdrant.close_clients()
+    mongo.close_client()
+    offload.shutdown()
@@ -0,0 +1,225 @@
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from threading import Lock
+from config.config import settings
+
+trace_logger = logging.getLogger("smartagent.trace")
+
+ENABLED = settings.METRICS_ENABLED
+TRACING = settings.TRACE_ENABLED
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._children = {}
+        self._lock = Lock()
+        REGISTRY.append(self)
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        # labels() may add a child from another thread while /metrics renders
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in sorted(children, key=lambda item: item[0]):
+            lines.extend(child.render(self.name, _label_text(self.label_names, values), self.label_names, values))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = Lock()
+
+    def inc(self, amount: float = 1.0):
+        if ENABLED:
+            with self._lock:
+                self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        if ENABLED:
+            self.value = value
+
+    def render(self, name, labels, label_names, values):
+        return [f"{name}{labels} {self.value:g}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = Lock()
+
+    def observe(self, value: float):
+        if ENABLED:
+            with self._lock:
+                self.counts[bisect_left(self.buckets, value)] += 1
+                self.sum += value
+
+    def render(self, name, labels, label_names, values):
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else f"{bound:g}"
+            lines.append(f"{name}_bucket{_label_text(label_names + ('le',), values + (le,))} {cumulative}")
+        lines.append(f"{name}_sum{labels} {self.sum:g}")
+        lines.append(f"{name}_count{labels} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labels)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+
+REGISTRY = []
+
+STAGE_SECONDS = Histogram("smartagent_stage_seconds", "Time spent per pipeline stage", ["stage"])
+STAGE_ERRORS = Counter("smartagent_stage_errors_total", "Stage calls that raised", ["stage"])
+IN_FLIGHT = Gauge("smartagent_in_flight", "Stage calls currently running", ["stage"])
+PAGES = Counter("smartagent_pages_total", "Crawled pages by outcome", ["outcome"])
+ITEMS = Counter("smartagent_items_total", "Items processed per stage (chunks, points, summaries)", ["stage"])
+QUEUE_DEPTH = Gauge("smartagent_queue_depth", "Items waiting in ingestion pipeline queues", ["queue"])
+JOBS = Gauge("smartagent_jobs", "Scrape jobs by state", ["state"])
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+_NOOP = nullcontext()
+
+# Per-request trace: (start time, finished spans)
+_trace = contextvars.ContextVar("smartagent_trace", default=None)
+
+
+def trace(name: str, **attributes):
+    """
+    Root span of one request, its child spans are logged as one JSON line
+    when it ends. Without tracing it is just timed(name).
+    """
+    if not TRACING:
+        return timed(name)
+    return _traced(name, attributes)
+
+
+@contextmanager
+def _traced(name, attributes):
+    spans = []
+    started = time.perf_counter()
+    token = _trace.set((started, spans))
+    try:
+        with _Timer(name):
+            yield
+    finally:
+        _trace.reset(token)
+        total_ms = (time.perf_counter() - started) * 1000
+        if total_ms >= settings.TRACE_MIN_MS:
+            trace_logger.info(json.dumps({"trace": name, **attributes, "total_ms": round(total_ms, 2),
+                                          "spans": sorted(spans, key=lambda span: span["start_ms"])}))
+
+
+class _Timer:
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        IN_FLIGHT.labels(self.stage).inc()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        IN_FLIGHT.labels(self.stage).dec()
+        STAGE_SECONDS.labels(self.stage).observe(elapsed)
+        if exc_type is not None:
+            STAGE_ERRORS.labels(self.stage).inc()
+        current = _trace.get() if TRACING else None
+        if current is not None:
+            trace_started, spans = current
+            spans.append({"name": self.stage, "start_ms": round((self.started - trace_started) * 1000, 2),
+                          "duration_ms": round(elapsed * 1000, 2), "error": exc_type is not None})
+        return False
+
+
+def timed(stage: str):
+    """Context manager timing one stage call, a shared no-op when metrics and tracing are off"""
+    if not (ENABLED or TRACING):
+        return _NOOP
+    return _Timer(stage)
+
+
+def instrument(stage: str):
+    """Decorator form of timed() for sync and async functions, returns the function untouched when disabled"""
+    def decorator(func):
+        if not (ENABLED or TRACING):
+            return func
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with _Timer(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
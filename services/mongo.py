@@ -1,9 +1,122 @@
-from pymongo import MongoClient
+import logging
+from functools import lru_cache
+from threading import Lock
+from pymongo import MongoClient, ASCENDING, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
 from config.config import settings
+from services.metrics import instrument
 
-client = MongoClient(settings.MONGODB_URL)
-db = client["Scraped_Data"]
-collection = db["sample"]
+logger = logging.getLogger(__name__)
 
-def clean_collection():
-    collection.delete_many({})
\ No newline at end of file
+
+@lru_cache(maxsize=1)
+def get_client() -> MongoClient:
+    """Built on first use, mongodb+srv:// URLs resolve DNS in the constructor"""
+    return MongoClient(settings.MONGODB_URL, serverSelectionTimeoutMS=settings.MONGO_TIMEOUT_MS)
+
+
+def get_collection():
+    return get_client()["Scraped_Data"]["sample"]
+
+
+def ping():
+    get_client().admin.command("ping")
+
+
+def close_client():
+    if get_client.cache_info().currsize:
+        get_client().close()
+        get_client.cache_clear()
+
+# Fields that make up a document for indexing, crawl bookkeeping stays in Mongo
+PAGE_PROJECTION = {"_id": 0, "url": 1, "title": 1, "content": 1, "session_id": 1}
+
+def ensure_indexes():
+    """Create the page indexes, safe to call on every startup"""
+    try:
+        collection = get_collection()
+        collection.create_index([("session_id", ASCENDING), ("url", ASCENDING)], unique=True, name="session_url")
+        collection.create_index([("url", ASCENDING)], name="url")
+    except PyMongoError as e:
+        logger.error(f"MongoDB index creation failed: {str(e)}")
+
+def clean_collection(session_id=None):
+    get_collection().delete_many({"session_id": session_id} if session_id else {})
+
+def load_page_state(session_id):
+    """Validators, content hash and outgoing links of every page from the last crawl"""
+    cursor = get_collection().find(
+        {"session_id": session_id},
+        {"_id": 0, "url": 1, "etag": 1, "last_modified": 1, "content_hash": 1, "links": 1}
+    )
+    return {page["url"]: page for page in cursor}
+
+def reset_page_state(session_id, urls):
+    """Forget validators and content hash so the next crawl re-fetches and re-indexes these pages"""
+    get_collection().update_many(
+        {"session_id": session_id, "url": {"$in": list(urls)}},
+        {"$unset": {"etag": "", "last_modified": "", "content_hash": ""}}
+    )
+
+def iter_session_pages(session_id, urls=None, batch_size=None, projection=None):
+    """Stream one session's pages from a server-side cursor"""
+    query = {"session_id": session_id}
+    if urls is not None:
+        query["url"] = {"$in": list(urls)}
+    return get_collection().find(query, projection or PAGE_PROJECTION).batch_size(batch_size or settings.MONGO_BULK_SIZE)
+
+def delete_pages(session_id, urls):
+    get_collection().delete_many({"session_id": session_id, "url": {"$in": urls}})
+
+
+class PageWriter:
+    """
+    Buffers page writes and sends them as unordered bulk_write upserts keyed
+    on (session_id, url), instead of one round trip per page.
+    on_error is called with the url of every write that failed.
+    """
+
+    def __init__(self, batch_size=None, on_error=None):
+        self.batch_size = batch_size or settings.MONGO_BULK_SIZE
+        self.on_error = on_error
+        self._buffer = []
+        self._lock = Lock()
+
+    def replace(self, page: dict):
+        key = {"session_id": page["session_id"], "url": page["url"]}
+        self._add(ReplaceOne(key, page, upsert=True), page["url"])
+
+    def update(self, session_id, url, fields: dict):
+        self._add(UpdateOne({"session_id": session_id, "url": url}, {"$set": fields}), url)
+
+    def _add(self, operation, url):
+        with self._lock:
+            self._buffer.append((operation, url))
+            if len(self._buffer) < self.batch_size:
+                return
+            pending, self._buffer = self._buffer, []
+        self._write(pending)
+
+    def flush(self):
+        with self._lock:
+            pending, self._buffer = self._buffer, []
+        if pending:
+            self._write(pending)
+
+    @instrument("mongo_write")
+    def _write(self, pending):
+        try:
+            get_collection().bulk_write([operation for operation, _ in pending], ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                url = pending[error["index"]][1]
+                logger.error(f"MongoDB write failed for {url}: {error.get('errmsg')}")
+                self._failed(url)
+        except PyMongoError as e:
+            logger.error(f"MongoDB bulk write of {len(pending)} pages failed: {str(e)}")
+            for _, url in pending:
+                self._failed(url)
+
+    def _failed(self, url):
+        if self.on_error:
+            self.on_error(url)
@@ -0,0 +1,204 @@
+import logging
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache, partial
+from multiprocessing import get_context
+from typing import Callable, List
+from config.config import settings
+from services.batching import Batcher
+from services.chunker import chunk_document
+from services.extractor import parse_page, content_hash
+
+logger = logging.getLogger(__name__)
+
+# Run in every pool worker before it takes work, see set_worker_initializer()
+_worker_initializer = None
+
+
+def enabled() -> bool:
+    """Whether parsing, chunking and local embedding run in the ingestion process pool"""
+    return settings.INGEST_EXECUTION == "processes"
+
+
+# Pool tasks. They take and return whole batches, so a batch costs one pickle
+# each way instead of one per page.
+
+def _init_worker(initializer, args):
+    logging.basicConfig(level=logging.INFO)
+    if initializer:
+        initializer(*args)
+
+
+def parse_pages(pages):
+    """[(url, html, domain, base)] -> [(document, links, content hash) or the exception it raised]"""
+    results = []
+    for url, html, domain, base in pages:
+        try:
+            document, links = parse_page(url, html, domain, base)
+            results.append((document, links, content_hash(document)))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def chunk_contents(contents):
+    """[content] -> [[(chunk_index, start, end, heading_path)]], the chunk text is sliced back out by the caller"""
+    results = []
+    for content in contents:
+        try:
+            results.append([(chunk["chunk_index"], chunk["start"], chunk["end"], chunk["heading_path"])
+                            for chunk in chunk_document(content)])
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def embed_texts(texts):
+    """Embed with the worker's own copy of the model, a float32 array pickles as one compact buffer"""
+    import numpy as np
+    from services.embeddings import get_backend
+    return np.asarray(get_backend().embed(texts), dtype=np.float32)
+
+
+def _chunk_dicts(content, spans):
+    return [
+        {"chunk_index": index, "content": content[start:end], "start": start, "end": end,
+         "heading_path": heading_path}
+        for index, start, end, heading_path in spans
+    ]
+
+
+class PoolBatcher:
+    """
+    Groups items submitted one at a time from crawler threads and tasks into
+    one pool task: a batch closes after max_wait_ms or once max_batch items
+    are collected. Batches are handed to the pool without waiting, so every
+    worker process stays busy.
+    """
+
+    def __init__(self, pool, func: Callable, max_batch: int = None, max_wait_ms: float = None):
+        self.pool = pool
+        self.func = func
+        self._batcher = Batcher(
+            self._dispatch,
+            max_batch or settings.INGEST_BATCH_SIZE,
+            settings.INGEST_BATCH_WAIT_MS if max_wait_ms is None else max_wait_ms,
+            name="offload-batcher",
+        )
+
+    def submit(self, item) -> Future:
+        return self._batcher.submit(item)
+
+    def _dispatch(self, items, futures):
+        self.pool.submit(self.func, items).add_done_callback(partial(self._deliver, futures))
+
+    @staticmethod
+    def _deliver(futures, task):
+        try:
+            results = task.result()
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        for future, result in zip(futures, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+def set_worker_initializer(initializer: Callable, *args):
+    """Run initializer(*args) in every pool worker, must be set before the pool is first used"""
+    global _worker_initializer
+    _worker_initializer = (initializer, args)
+
+
+def _workers() -> int:
+    return settings.INGEST_PROCESSES or os.cpu_count() or 1
+
+
+@lru_cache(maxsize=1)
+def get_pool() -> ProcessPoolExecutor:
+    # Workers are spawned, forking a process that runs crawler threads can deadlock
+    workers = _workers()
+    initializer, args = _worker_initializer or (None, ())
+    logger.info(f"Starting ingestion process pool with {workers} workers")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                               initializer=_init_worker, initargs=(initializer, args))
+
+
+@lru_cache(maxsize=1)
+def _page_batcher() -> PoolBatcher:
+    return PoolBatcher(get_pool(), parse_pages)
+
+
+@lru_cache(maxsize=1)
+def _chunk_batcher() -> PoolBatcher:
+    return PoolBatcher(get_pool(), chunk_contents)
+
+
+def parse(url: str, html: str, domain: str, base: str = None) -> Future:
+    """Future of (document, links, content hash) for one fetched page"""
+    return _page_batcher().submit((url, html, domain, base))
+
+
+def chunk(content: str) -> Future:
+    """Future of chunk_document(content)"""
+    future = Future()
+
+    def done(task):
+        try:
+            future.set_result(_chunk_dicts(content, task.result()))
+        except Exception as e:
+            future.set_exception(e)
+    _chunk_batcher().submit(content).add_done_callback(done)
+    return future
+
+
+def chunk_many(contents: List[str]) -> List[List[dict]]:
+    """chunk_document for a batch that is already collected, as one pool task"""
+    results = get_pool().submit(chunk_contents, contents).result()
+    chunked = []
+    for content, spans in zip(contents, results):
+        if isinstance(spans, Exception):
+            raise spans
+        chunked.append(_chunk_dicts(content, spans))
+    return chunked
+
+
+def _embed_in_pool(texts: List[str]) -> List[List[float]]:
+    return get_pool().submit(embed_texts, texts).result().tolist()
+
+
+def embedder() -> Callable | None:
+    """
+    Embedding function for get_embeddings(embed=...) during ingestion, None to
+    embed in-process. Only a local model is worth moving, API calls do not hold the GIL.
+    """
+    if enabled() and settings.EMBEDDING_BACKEND == "local":
+        return _embed_in_pool
+    return None
+
+
+def _warm_worker(load_model: bool):
+    if load_model:
+        embed_texts(["warm-up"])
+    return os.getpid()
+
+
+def warm_up():
+    """Start the workers (spawning one imports the app modules) and load their embedding models"""
+    if not enabled():
+        return
+    pool = get_pool()
+    tasks = [pool.submit(_warm_worker, embedder() is not None) for _ in range(_workers())]
+    pids = {task.result() for task in tasks}
+    logger.info(f"Ingestion process pool ready, {len(pids)} workers warmed up")
+
+
+def shutdown():
+    if get_pool.cache_info().currsize:
+        get_pool().shutdown(wait=False, cancel_futures=True)
+        get_pool.cache_clear()
+        _page_batcher.cache_clear()
+        _chunk_batcher.cache_clear()
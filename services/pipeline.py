@@ -0,0 +1,138 @@
+import asyncio
+import logging
+from config.config import settings
+from services.qdrant import BulkUpserter, point_id, point_vector
+from services.utility import get_embeddings
+from services.chunker import chunk_document
+from services.summarizer import get_summarizer
+from services.metrics import QUEUE_DEPTH
+from services import offload
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+async def _next_batch(queue: asyncio.Queue, size: int):
+    """Wait for one item, then drain whatever is already queued up to size"""
+    item = await queue.get()
+    if item is _DONE:
+        return [], True
+    batch = [item]
+    while len(batch) < size:
+        try:
+            item = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            break
+        if item is _DONE:
+            return batch, True
+        batch.append(item)
+    return batch, False
+
+
+class IngestionPipeline:
+    """
+    Streams crawled documents through embed -> upsert stages while the crawl
+    is still running. Stages are connected by bounded queues, so a slow stage
+    applies backpressure to the crawler instead of buffering the whole site.
+    """
+
+    def __init__(self, session_id, status=None, queue_size=None, embed_batch_size=None, upsert_batch_size=None,
+                 sparse=False, on_progress=None, on_error=None):
+        self.session_id = session_id
+        self.status = status
+        self.on_progress = on_progress
+        self.on_error = on_error
+        self.sparse = sparse
+        self.embed_batch_size = embed_batch_size or settings.EMBED_BATCH_SIZE
+        self.upsert_batch_size = upsert_batch_size or settings.UPSERT_BATCH_SIZE
+        queue_size = queue_size or settings.PIPELINE_QUEUE_SIZE
+        self._embed_queue = asyncio.Queue(maxsize=queue_size)
+        self._upsert_queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks = []
+        self._upserter = BulkUpserter(batch_size=self.upsert_batch_size, on_error=on_error)
+        self.embedded = 0
+        self.upserted = 0
+
+    async def __aenter__(self):
+        self._tasks = [
+            asyncio.create_task(self._embed_stage()),
+            asyncio.create_task(self._upsert_stage()),
+        ]
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._embed_queue.put(_DONE)
+        await asyncio.gather(*self._tasks)
+        logger.info(f"Pipeline finished: {self.embedded} embedded, {self.upserted} upserted")
+
+    async def put(self, document: dict):
+        """Chunk a parsed document and queue its chunks, waits while the embed queue is full"""
+        if offload.enabled():
+            chunks = await asyncio.wrap_future(offload.chunk(document["content"]))
+        else:
+            chunks = await asyncio.to_thread(chunk_document, document["content"])
+        for chunk in chunks:
+            await self._embed_queue.put({**document, **chunk})
+            QUEUE_DEPTH.labels("embed").inc()
+
+    async def _embed_stage(self):
+        done = False
+        while not done:
+            batch, done = await _next_batch(self._embed_queue, self.embed_batch_size)
+            QUEUE_DEPTH.labels("embed").dec(len(batch))
+            if not batch:
+                continue
+            texts = [doc["content"] for doc in batch]
+            try:
+                # Summaries are computed once here and served from the payload at chat time
+                if settings.INGEST_SUMMARIES:
+                    vectors, summaries = await asyncio.gather(
+                        asyncio.to_thread(get_embeddings, texts, offload.embedder()),
+                        asyncio.to_thread(lambda: get_summarizer().summarize_many(texts)),
+                    )
+                    for doc, summary in zip(batch, summaries):
+                        # None (short chunk or failed summary) stays out of the payload, failures are retried at query time
+                        if summary is not None:
+                            doc["summary"] = summary
+                else:
+                    vectors = await asyncio.to_thread(get_embeddings, texts, offload.embedder())
+            except Exception as e:
+                logger.error(f"Batch embedding failed: {str(e)}")
+                if self.on_error:
+                    for url in {doc["url"] for doc in batch}:
+                        self.on_error(url)
+                continue
+            self.embedded += len(batch)
+            if self.on_progress:
+                self.on_progress(embedded=self.embedded)
+            for doc, vector in zip(batch, vectors):
+                await self._upsert_queue.put((doc, vector))
+                QUEUE_DEPTH.labels("upsert").inc()
+        await self._upsert_queue.put(_DONE)
+
+    async def _upsert_stage(self):
+        done = False
+        while not done:
+            batch, done = await _next_batch(self._upsert_queue, self.upsert_batch_size)
+            QUEUE_DEPTH.labels("upsert").dec(len(batch))
+            if not batch:
+                continue
+            points = [
+                {
+                    "id": point_id(self.session_id, doc["url"], doc["chunk_index"]),
+                    "vector": point_vector(vector, doc["content"] if self.sparse else None),
+                    "payload": {**doc, "session_id": self.session_id}
+                }
+                for doc, vector in batch
+            ]
+            # Only blocks when the upserter already has its maximum of requests in flight
+            await asyncio.to_thread(self._upserter.add, points)
+            if self.status:
+                self.status.update(message=f"Indexed {self._upserter.upserted} chunks, crawl in progress...")
+            if self.on_progress:
+                self.on_progress(upserted=self._upserter.upserted)
+        await asyncio.to_thread(self._upserter.close)
+        self.upserted = self._upserter.upserted
+        if self.on_progress:
+            self.on_progress(upserted=self.upserted)
@@ -0,0 +1,62 @@
+import asyncio
+from threading import Lock
+from config.config import settings
+
+
+class ProgressChannel:
+    """
+    Push feed of one job's progress. Publishers (crawler threads, pipeline
+    tasks) only flip a flag and, at most once per delivered update, schedule
+    a wake-up on each subscriber's loop, so publishing never blocks or waits.
+    Subscribers read a fresh snapshot at most every min_interval seconds,
+    which coalesces any number of page events into one message.
+    """
+
+    def __init__(self, snapshot, min_interval: float = None, heartbeat: float = None):
+        self._snapshot = snapshot
+        self.min_interval = settings.PROGRESS_MIN_INTERVAL if min_interval is None else min_interval
+        self.heartbeat = heartbeat or settings.PROGRESS_HEARTBEAT
+        self._subscribers = set()
+        self._lock = Lock()
+        self._pending = False
+
+    def publish(self):
+        if self._pending:
+            return
+        self._pending = True
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, event in subscribers:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The subscriber's loop already closed, it unsubscribes on its own
+                pass
+
+    async def subscribe(self):
+        """
+        Yields progress dicts until the job completes. None is yielded when
+        nothing changed for heartbeat seconds, so callers can keep the connection alive.
+        """
+        entry = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._subscribers.add(entry)
+        try:
+            last = None
+            while True:
+                self._pending = False
+                entry[1].clear()
+                snapshot = self._snapshot()
+                if snapshot != last:
+                    yield snapshot
+                    last = snapshot
+                if snapshot.get("completed"):
+                    return
+                await asyncio.sleep(self.min_interval)
+                try:
+                    await asyncio.wait_for(entry[1].wait(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                self._subscribers.discard(entry)
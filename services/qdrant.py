@@ -1,8 +1,267 @@
-import qdrant_client
+import logging
+import random
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from threading import Lock
 from config.config import settings
+from services.sparse import document_sparse_vector
+from services.metrics import instrument, ITEMS
 
-qdrant_client = qdrant_client.QdrantClient(
-    settings.QDRANT_HOST, 
-    api_key=settings.QDRANT_API_KEY
-)
+# qdrant_client takes about a second to import, so it is only imported once a client or model is needed
 
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def get_qdrant_client():
+    from qdrant_client import QdrantClient
+    return QdrantClient(settings.QDRANT_HOST, api_key=settings.QDRANT_API_KEY)
+
+
+@lru_cache(maxsize=1)
+def get_async_qdrant_client():
+    """Used on the request path so searches never block the event loop"""
+    from qdrant_client import AsyncQdrantClient
+    return AsyncQdrantClient(settings.QDRANT_HOST, api_key=settings.QDRANT_API_KEY)
+
+
+async def close_clients():
+    """Close whichever clients were built, on application shutdown"""
+    try:
+        if get_async_qdrant_client.cache_info().currsize:
+            await get_async_qdrant_client().close()
+        if get_qdrant_client.cache_info().currsize:
+            get_qdrant_client().close()
+    except Exception as e:
+        logger.error(f"Closing Qdrant clients failed: {str(e)}")
+    get_async_qdrant_client.cache_clear()
+    get_qdrant_client.cache_clear()
+
+# The dense vector is the collection's unnamed default vector
+DENSE_VECTOR = ""
+SPARSE_VECTOR = "bm25"
+
+def collection_config() -> dict:
+    """create_collection kwargs for the configured collection profile"""
+    from qdrant_client import models
+    config = {
+        "vectors_config": models.VectorParams(
+            size=384,
+            distance=models.Distance.COSINE,
+            on_disk=settings.QDRANT_ON_DISK_VECTORS,
+        ),
+        "hnsw_config": models.HnswConfigDiff(
+            m=settings.QDRANT_HNSW_M,
+            ef_construct=settings.QDRANT_HNSW_EF_CONSTRUCT,
+        ),
+        # BM25 term weights for hybrid retrieval, Qdrant applies the IDF at query time
+        "sparse_vectors_config": {
+            SPARSE_VECTOR: models.SparseVectorParams(modifier=models.Modifier.IDF),
+        },
+        "on_disk_payload": settings.QDRANT_ON_DISK_PAYLOAD,
+        # BulkUpserter.flush() relies on updates being applied in order, which
+        # Qdrant only guarantees within one shard. Distributed clusters would
+        # otherwise default to one shard per node.
+        "shard_number": 1,
+    }
+    if settings.QDRANT_QUANTIZATION:
+        # int8 scalar quantization: 4x smaller vectors, rescored against the originals at query time
+        config["quantization_config"] = models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=settings.QDRANT_QUANTIZATION_ALWAYS_RAM,
+            )
+        )
+    return config
+
+def create_payload_indexes(client=None, collection_name: str = None):
+    """Keyword indexes for the fields every search and delete filters on"""
+    from qdrant_client import models
+    client = client or get_qdrant_client()
+    collection_name = collection_name or settings.COLLECTION_NAME
+    client.create_payload_index(
+        collection_name=collection_name,
+        field_name="session_id",
+        field_schema=models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=True),
+    )
+    client.create_payload_index(
+        collection_name=collection_name,
+        field_name="url",
+        field_schema=models.PayloadSchemaType.KEYWORD,
+    )
+
+def ensure_qdrant_collection() -> bool:
+    """Create the collection if needed, returns whether it can store sparse (BM25) vectors"""
+    from qdrant_client.http.exceptions import UnexpectedResponse
+    qdrant_client = get_qdrant_client()
+    try:
+        if not qdrant_client.collection_exists(settings.COLLECTION_NAME):
+            qdrant_client.create_collection(collection_name=settings.COLLECTION_NAME, **collection_config())
+            logger.info("Qdrant collection created")
+        # Idempotent, also upgrades collections created before the indexes existed
+        create_payload_indexes()
+        if has_sparse_vectors(qdrant_client.get_collection(settings.COLLECTION_NAME)):
+            return True
+        if settings.RETRIEVAL_MODE == "hybrid":
+            logger.warning("Collection has no sparse vectors, recreate it to enable hybrid retrieval")
+        return False
+    except UnexpectedResponse as e:
+        logger.error(f"Qdrant collection creation failed: {str(e)}")
+        return False
+
+def delete_url_points(session_id, urls):
+    """Delete every chunk of the given pages for one session"""
+    from qdrant_client.http.exceptions import UnexpectedResponse
+    from qdrant_client.http.models import FilterSelector, Filter, FieldCondition, MatchValue, MatchAny
+    try:
+        get_qdrant_client().delete(
+            collection_name=settings.COLLECTION_NAME,
+            points_selector=FilterSelector(filter=Filter(must=[
+                FieldCondition(key="session_id", match=MatchValue(value=session_id)),
+                FieldCondition(key="url", match=MatchAny(any=urls)),
+            ])),
+            wait=True
+        )
+    except UnexpectedResponse as e:
+        logger.error(f"Qdrant point deletion failed: {str(e)}")
+
+def delete_session_points(session_id):
+    from qdrant_client.http.exceptions import UnexpectedResponse
+    from qdrant_client.http.models import FilterSelector, Filter, FieldCondition, MatchValue
+    try:
+        get_qdrant_client().delete(
+            collection_name=settings.COLLECTION_NAME,
+            points_selector=FilterSelector(filter=Filter(must=[
+                FieldCondition(key="session_id", match=MatchValue(value=session_id)),
+            ])),
+            wait=True
+        )
+    except UnexpectedResponse as e:
+        logger.error(f"Qdrant point deletion failed: {str(e)}")
+
+def search_params():
+    from qdrant_client import models
+    quantization = None
+    if settings.QDRANT_QUANTIZATION:
+        quantization = models.QuantizationSearchParams(
+            rescore=True,
+            oversampling=settings.QDRANT_RESCORE_OVERSAMPLING,
+        )
+    return models.SearchParams(hnsw_ef=settings.QDRANT_HNSW_EF, quantization=quantization)
+
+def has_sparse_vectors(collection_info) -> bool:
+    """Collections created before hybrid retrieval have no sparse vector to write or query"""
+    return SPARSE_VECTOR in (collection_info.config.params.sparse_vectors or {})
+
+def dense_vector(point):
+    """Points from collections with a sparse vector return their vectors by name"""
+    return point.vector.get(DENSE_VECTOR) if isinstance(point.vector, dict) else point.vector
+
+def point_vector(vector, text: str = None):
+    """The dense vector alone, or together with the chunk's BM25 sparse vector when text is given"""
+    if text is None:
+        return vector
+    return {DENSE_VECTOR: vector, SPARSE_VECTOR: document_sparse_vector(text)}
+
+POINT_NAMESPACE = uuid.UUID("6f1c8a52-93e4-4c55-9d0e-2f4b7a1e8c33")
+
+def point_id(session_id: str, url: str, chunk_index: int) -> str:
+    """Stable point id, so re-ingesting or retrying a chunk overwrites it instead of duplicating it"""
+    return str(uuid.uuid5(POINT_NAMESPACE, f"{session_id}\0{url}\0{chunk_index}"))
+
+
+class BulkUpserter:
+    """
+    Buffers points and upserts them in large batches with several requests
+    in flight. Requests use wait=False and are retried with exponential
+    backoff. flush() is the consistency barrier for everything added so far.
+    on_error is called with the url of every point in a batch that failed for good.
+    """
+
+    def __init__(self, collection_name: str = None, batch_size: int = None, parallel: int = None,
+                 max_retries: int = None, backoff: float = None, client=None, on_error=None):
+        self.client = client or get_qdrant_client()
+        self.collection_name = collection_name or settings.COLLECTION_NAME
+        self.batch_size = batch_size or settings.UPSERT_BATCH_SIZE
+        self.parallel = parallel or settings.UPSERT_PARALLELISM
+        self.max_retries = settings.UPSERT_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff = settings.UPSERT_RETRY_BACKOFF if backoff is None else backoff
+        self.on_error = on_error
+        self._executor = ThreadPoolExecutor(max_workers=self.parallel, thread_name_prefix="qdrant-upsert")
+        self._in_flight = deque()
+        self._buffer = []
+        self._last_batch = None
+        self._last_result = None
+        self._lock = Lock()
+        self.upserted = 0
+        self.failed = 0
+
+    def add(self, points: list):
+        from qdrant_client import models
+        # Local-mode clients (tests, benchmarks) only accept PointStruct, the server takes either
+        self._buffer.extend(models.PointStruct(**point) if isinstance(point, dict) else point for point in points)
+        while len(self._buffer) >= self.batch_size:
+            batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            self._submit(batch)
+
+    def _submit(self, batch):
+        # Backpressure: never more than `parallel` requests outstanding
+        while len(self._in_flight) >= self.parallel:
+            self._in_flight.popleft().result()
+        self._last_batch = batch
+        self._last_result = self._executor.submit(self._upsert_with_retry, batch, False)
+        self._in_flight.append(self._last_result)
+
+    @instrument("qdrant_upsert")
+    def _upsert_with_retry(self, batch, wait, barrier=False) -> bool:
+        """
+        Upsert one batch with retries, False once it failed for good. A barrier
+        re-sends a batch that was already counted as upserted, so it only
+        counts the batch when it fails.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.client.upsert(collection_name=self.collection_name, points=batch, wait=wait)
+                if not barrier:
+                    with self._lock:
+                        self.upserted += len(batch)
+                    ITEMS.labels("upserted").inc(len(batch))
+                return True
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Upsert of {len(batch)} points failed after {attempt + 1} attempts: {str(e)}")
+                    with self._lock:
+                        if barrier:
+                            self.upserted -= len(batch)
+                        self.failed += len(batch)
+                    if self.on_error:
+                        for url in {point.payload.get("url") for point in batch if point.payload}:
+                            self.on_error(url)
+                    return False
+                delay = self.backoff * (2 ** attempt) * (1 + random.random())
+                logger.warning(f"Upsert of {len(batch)} points failed, retrying in {delay:.1f}s: {str(e)}")
+                time.sleep(delay)
+
+    def flush(self):
+        """Send the remaining buffer and wait until every point is applied"""
+        if self._buffer:
+            self._submit(self._buffer)
+            self._buffer = []
+        while self._in_flight:
+            self._in_flight.popleft().result()
+
+        # A last batch that failed for good was already reported, there is nothing to wait on
+        if self._last_batch and self._last_result.result():
+            # Qdrant applies updates to a shard in order (see collection_config), so waiting
+            # on one more (idempotent, thanks to stable ids) write means all earlier ones landed
+            self._upsert_with_retry(self._last_batch, True, barrier=True)
+        self._last_batch = None
+        self._last_result = None
+
+    def close(self):
+        self.flush()
+        self._executor.shutdown()
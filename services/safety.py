@@ -0,0 +1,300 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import lru_cache
+from ipaddress import ip_address
+from typing import Dict, List, NamedTuple
+from urllib.parse import urlparse
+from config.config import settings
+from services.batching import Batcher
+from services.frontier import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+SUSPICIOUS_KEYWORDS = [
+    'xxx', 'porn', 'adult', 'nsfw', 'sex',
+    'gambling', 'bet', 'casino',
+    'hack', 'crack', 'warez', 'torrent',
+    'drugs', 'darknet', 'blackmarket'
+]
+
+
+class Verdict(NamedTuple):
+    safe: bool
+    reason: str
+
+
+SAFE = Verdict(True, "URL is safe")
+
+
+def is_onion_domain(url: str) -> bool:
+    """Check if URL is a .onion (Tor) domain"""
+    parsed = urlparse(url)
+    return parsed.netloc.endswith('.onion')
+
+
+def contains_suspicious_keywords(url: str) -> bool:
+    """Check for suspicious keywords in URL"""
+    url_lower = url.lower()
+    return any(keyword in url_lower for keyword in SUSPICIOUS_KEYWORDS)
+
+
+def precheck(url: str, keywords: bool = True) -> Verdict | None:
+    """Local rules that need no lookup, None when the URL passes them"""
+    parsed = urlparse(url)
+    if not all([parsed.scheme, parsed.netloc]):
+        return Verdict(False, "Invalid URL format")
+    if parsed.scheme != 'https':
+        return Verdict(False, "Only HTTPS URLs are allowed")
+    if is_onion_domain(url):
+        return Verdict(False, "Tor/Onion domains are not allowed")
+    if keywords and contains_suspicious_keywords(url):
+        return Verdict(False, "URL contains suspicious keywords")
+    return None
+
+
+class VerdictCache:
+    """Thread-safe LRU of verdicts where every entry carries its own TTL"""
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries or settings.SAFETY_CACHE_SIZE
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Verdict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            verdict, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return verdict
+
+    def put(self, key, verdict: Verdict, ttl: float):
+        with self._lock:
+            self._entries[key] = (verdict, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def url_expressions(url: str) -> List[tuple[str, bool]]:
+    """
+    The host/path expressions Safe Browsing hashes for a URL, as
+    (expression, host_only) pairs: up to 5 host suffixes times up to 6 path prefixes.
+    """
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").strip(".")
+    try:
+        ip_address(host)
+        hosts = [host]
+    except ValueError:
+        parts = host.split(".")
+        hosts = [host] + [".".join(parts[i:]) for i in range(max(1, len(parts) - 5), len(parts) - 1)]
+
+    path = parsed.path or "/"
+    paths = [f"{path}?{parsed.query}"] if parsed.query else []
+    paths.append(path)
+    prefix = "/"
+    for part in [part for part in path.split("/") if part][:3]:
+        if prefix not in paths:
+            paths.append(prefix)
+        prefix = f"{prefix}{part}/"
+    if prefix not in paths:
+        paths.append(prefix)
+
+    return [(f"{host}{path}", path == "/") for host in hosts for path in paths]
+
+
+class HashPrefixList:
+    """
+    Offline lookups against a local list of SHA-256 hash prefixes, the format
+    the Safe Browsing Update API distributes. A prefix hit counts as a match.
+    """
+
+    def __init__(self, prefixes=()):
+        self._by_length = {}
+        for prefix in prefixes:
+            self._by_length.setdefault(len(prefix), set()).add(prefix)
+
+    @classmethod
+    def from_file(cls, path: str) -> "HashPrefixList":
+        """Load hex-encoded prefixes (4 to 32 bytes), one per line, # starts a comment"""
+        if not os.path.exists(path):
+            logger.warning(f"Hash-prefix list {path} not found, offline safety checks only use local rules")
+            return cls()
+        with open(path) as f:
+            lines = (line.split("#")[0].strip() for line in f)
+            prefixes = [bytes.fromhex(line) for line in lines if line]
+        logger.info(f"Loaded {len(prefixes)} Safe Browsing hash prefixes from {path}")
+        return cls(prefixes)
+
+    def _matches(self, expression: str) -> bool:
+        digest = hashlib.sha256(expression.encode("utf-8")).digest()
+        return any(digest[:length] in prefixes for length, prefixes in self._by_length.items())
+
+    def lookup_urls(self, urls: List[str]) -> Dict[str, dict]:
+        results = {}
+        for url in urls:
+            matched = [host_only for expression, host_only in url_expressions(url) if self._matches(expression)]
+            results[url] = {"malicious": bool(matched), "threats": ["LOCAL_LIST_MATCH"] if matched else [],
+                            "host": any(matched)}
+        return results
+
+
+class SafeBrowsingLookup:
+    """
+    Safe Browsing Lookup API, split into requests of at most SAFETY_BATCH_SIZE URLs.
+    The bare scheme://host/ of every URL is looked up alongside it, a hit on
+    that root flags the URL with "host": True so the verdict covers the whole site.
+    """
+
+    def __init__(self, api_key: str, batch_size: int = None):
+        from pysafebrowsing import SafeBrowsing
+        self._client = SafeBrowsing(api_key)
+        self.batch_size = min(batch_size or settings.SAFETY_BATCH_SIZE, 500)
+
+    @staticmethod
+    def _host_root(url: str) -> str | None:
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}/" if parsed.scheme and parsed.netloc else None
+
+    def lookup_urls(self, urls: List[str]) -> Dict[str, dict]:
+        roots = {url: self._host_root(url) for url in urls}
+        expressions = list(dict.fromkeys([*urls, *(root for root in roots.values() if root)]))
+        found = {}
+        for i in range(0, len(expressions), self.batch_size):
+            found.update(self._client.lookup_urls(expressions[i:i + self.batch_size]) or {})
+
+        results = {}
+        for url in urls:
+            result = dict(found.get(url) or {})
+            root = found.get(roots[url]) or {}
+            if root.get("malicious"):
+                threats = list(dict.fromkeys([*result.get("threats", []), *root.get("threats", [])]))
+                result.update(malicious=True, threats=threats, host=True)
+            results[url] = result
+        return results
+
+
+class SafetyChecker:
+    """
+    Cached URL safety verdicts, keyed by canonical URL and by host.
+    "No threat found" and "unsafe" verdicts are both cached, with separate
+    TTLs. Cache misses from concurrent callers are merged into one lookup,
+    so vetting the links of many pages takes a few round trips, not one per page.
+
+    Links discovered while crawling an accepted site skip the keyword rule
+    and fail open when the lookup errors, the submitted URL fails closed.
+    """
+
+    def __init__(self, lookup=None, cache: VerdictCache = None, max_batch: int = None, max_wait_ms: float = None):
+        self.lookup = lookup
+        self.cache = cache or VerdictCache()
+        self._batcher = Batcher(
+            self._check_batch,
+            max_batch or settings.SAFETY_BATCH_SIZE,
+            settings.SAFETY_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms,
+            size=lambda item: len(item[0]),
+            name="safety-batcher",
+        )
+
+    def _cached(self, url: str, discovered: bool) -> Verdict | None:
+        verdict = precheck(url, keywords=not discovered)
+        if verdict is not None:
+            return verdict
+        if self.lookup is None:
+            return SAFE
+        host_verdict = self.cache.get(("host", urlparse(url).hostname))
+        if host_verdict is not None and not host_verdict.safe:
+            return host_verdict
+        key = canonicalize_url(url) or url
+        if not discovered:
+            failed = self.cache.get(("error", key))
+            if failed is not None:
+                return failed
+        return self.cache.get(("url", key))
+
+    def submit(self, urls: List[str], discovered: bool = False) -> Future:
+        """
+        Future resolving to {url: Verdict}, already done when every URL is cached.
+        discovered marks links found on crawled pages rather than a submitted URL.
+        """
+        verdicts, misses = {}, []
+        for url in dict.fromkeys(urls):
+            verdict = self._cached(url, discovered)
+            if verdict is None:
+                misses.append(url)
+            else:
+                verdicts[url] = verdict
+
+        if not misses:
+            future = Future()
+            future.set_result(verdicts)
+            return future
+        return self._batcher.submit((misses, verdicts, discovered))
+
+    def check(self, urls: List[str], discovered: bool = False) -> Dict[str, Verdict]:
+        return self.submit(urls, discovered).result()
+
+    async def acheck(self, urls: List[str], discovered: bool = False) -> Dict[str, Verdict]:
+        return await asyncio.wrap_future(self.submit(urls, discovered))
+
+    def _resolve(self, urls: List[str]) -> Dict[str, Verdict] | None:
+        """Verdicts from one lookup, None when the lookup failed"""
+        canonical = {url: canonicalize_url(url) or url for url in urls}
+        lookup_urls = list(dict.fromkeys(canonical.values()))
+        try:
+            results = self.lookup.lookup_urls(lookup_urls)
+        except Exception as e:
+            logger.error(f"URL safety lookup failed for {len(lookup_urls)} URLs: {str(e)}")
+            return None
+
+        by_key = {}
+        for key in lookup_urls:
+            result = results.get(key) or {}
+            if result.get("malicious"):
+                verdict = Verdict(False, f"URL flagged as unsafe: {', '.join(result.get('threats', []))}")
+                self.cache.put(("url", key), verdict, settings.SAFETY_UNSAFE_TTL)
+                if result.get("host"):
+                    self.cache.put(("host", urlparse(key).hostname), verdict, settings.SAFETY_UNSAFE_TTL)
+            else:
+                verdict = SAFE
+                self.cache.put(("url", key), verdict, settings.SAFETY_SAFE_TTL)
+            by_key[key] = verdict
+        return {url: by_key[canonical[url]] for url in urls}
+
+    def _lookup_failed(self, url: str, discovered: bool) -> Verdict:
+        # A discovered link fails open and is not cached, an outage must not drop every link
+        # of a crawl. The submitted URL fails closed, cached briefly so an outage is not hammered
+        if discovered:
+            return SAFE
+        verdict = Verdict(False, "Safety check failed, try again later")
+        self.cache.put(("error", canonicalize_url(url) or url), verdict, settings.SAFETY_ERROR_TTL)
+        return verdict
+
+    def _check_batch(self, items, futures):
+        resolved = self._resolve(list(dict.fromkeys(url for misses, _, _ in items for url in misses)))
+        for (misses, verdicts, discovered), future in zip(items, futures):
+            if resolved is None:
+                verdicts.update((url, self._lookup_failed(url, discovered)) for url in misses)
+            else:
+                verdicts.update((url, resolved[url]) for url in misses)
+            future.set_result(verdicts)
+
+
+@lru_cache(maxsize=1)
+def get_safety_checker() -> SafetyChecker:
+    if settings.SAFETY_MODE == "off":
+        return SafetyChecker(lookup=None)
+    if settings.SAFETY_MODE == "offline":
+        return SafetyChecker(HashPrefixList.from_file(settings.SAFETY_HASH_PREFIX_PATH))
+    return SafetyChecker(SafeBrowsingLookup(settings.GOOGLE_API_KEY))
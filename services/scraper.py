@@ -1,254 +1,497 @@
 from urllib.parse import urlparse
-import requests
-from bs4 import BeautifulSoup
-from services.mongo import collection,clean_collection
-from services.qdrant import qdrant_client
+import asyncio
+import httpx
+from services.mongo import (clean_collection, load_page_state, delete_pages, iter_session_pages, reset_page_state,
+                           PageWriter)
+from services.qdrant import (BulkUpserter, point_id, point_vector, ensure_qdrant_collection, delete_url_points,
+                             delete_session_points)
 import logging
 from requests.exceptions import RequestException
-from pymongo.errors import PyMongoError
-from qdrant_client.http.exceptions import UnexpectedResponse
-from qdrant_client.http.models import VectorParams, Distance
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from config.config import settings
 from services.utility import get_embeddings 
+from services.crawler import AsyncCrawler, UnsupportedContent, fetch_page
+from services.extractor import parse_page, content_hash
+from services.frontier import URLFrontier, normalize_url
+from services.safety import get_safety_checker
+from services.answer_cache import invalidate_answers
+from services.pipeline import IngestionPipeline
+from services.chunker import chunk_document
+from services.summarizer import get_summarizer
+from services.jobs import JobScheduler
+from services import offload
+from services.metrics import instrument, PAGES
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class ScrapingStatus:
-    def __init__(self):
-        self._lock = Lock()
-        self._is_scraping = False
-        self._is_upserting = False
-        self._completed = False
-        self.current_message = "Waiting to start"
-
-    def update(self, *, scraping=None, upserting=None, completed=None, message=None):
-        with self._lock:
-            if scraping is not None:
-                self._is_scraping = scraping
-            if upserting is not None:
-                self._is_upserting = upserting
-            if completed is not None:
-                self._completed = completed
-            if message is not None:
-                self.current_message = message
-
-    @property
-    def is_completed(self):
-        with self._lock:
-            return self._completed and not (self._is_scraping or self._is_upserting)
-
-# Initialize at module level
-scraping_status = ScrapingStatus()
-
-# Thread-safe sets with locks
-class ThreadSafeSet:
-    def __init__(self):
-        self._set = set()
-        self._lock = Lock()
-
-    def add(self, item):
-        with self._lock:
-            self._set.add(item)
-
-    def __contains__(self, item):
-        with self._lock:
-            return item in self._set
-
-    def __len__(self):
-        with self._lock:
-            return len(self._set)
-
-scraped_urls = ThreadSafeSet()
-failed_urls = ThreadSafeSet()
-
-
-def scrape_single_page(url, domain, session_id):
-    if url in scraped_urls or url in failed_urls:
-        return []
+def conditional_headers(state):
+    """If-None-Match / If-Modified-Since headers from the previous crawl of a page"""
+    headers = {}
+    if state and state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state and state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+    return headers
+
+
+def process_page(job, url, html, headers=None, state=None, base=None):
+    """
+    Parse a fetched page and store it in MongoDB, returns (document, links).
+    document is None when the page content is unchanged since the last crawl.
+    base is the URL the page was served from, when a redirect moved it.
+    """
+    if offload.enabled():
+        document, new_urls, digest = offload.parse(url, html, job.frontier.domain, base).result()
+    else:
+        document, new_urls = parse_page(url, html, job.frontier.domain, base)
+        digest = content_hash(document)
+    return store_page(job, url, document, new_urls, digest, headers, state)
+
+
+def store_page(job, url, document, new_urls, digest, headers=None, state=None):
+    """Store a parsed page unless its content hash is unchanged, see process_page"""
+    session_id = job.session_id
+    document["session_id"] = session_id
+    validators = {
+        "etag": headers.get("ETag") if headers else None,
+        "last_modified": headers.get("Last-Modified") if headers else None,
+    }
+
+    # Writes are buffered, failures surface at flush time through the writer's on_error
+    if state and state.get("content_hash") == digest:
+        # Same content behind new validators, nothing to re-embed
+        job.page_writer.update(session_id, url, validators)
+        job.scraped_urls.add(url)
+        job.unchanged_urls.add(url)
+        PAGES.labels("unchanged").inc()
+        job.publish()
+        return None, new_urls
+
+    job.page_writer.replace({**document, **validators, "content_hash": digest, "links": new_urls})
+    job.scraped_urls.add(url)
+    PAGES.labels("changed").inc()
+    job.publish()
+    logger.info(f"Successfully scraped: {url}")
+
+    if state:
+        # The page changed, drop its old chunks before the new ones are upserted
+        delete_url_points(session_id, [url])
+
+    return document, new_urls
+
+
+def _not_modified(job, url, state):
+    """Handle a 304: the page and its links are exactly as stored"""
+    job.scraped_urls.add(url)
+    job.unchanged_urls.add(url)
+    PAGES.labels("not_modified").inc()
+    job.publish()
+    return None, state.get("links", [])
+
+
+def _record_http_error(job, url, status_code):
+    if status_code in (404, 410):
+        job.gone_urls.add(url)
+    else:
+        job.error_urls.add(url)
+
+
+def _failed(job, url, error=False):
+    """Record a page that was not indexed, error marks a fetch that failed rather than a page to skip"""
+    if error:
+        job.error_urls.add(url)
+    job.failed_urls.add(url)
+    PAGES.labels("failed").inc()
+    job.publish()
+    return None, []
+
+
+def _is_valid_url(job, url):
+    parsed_url = urlparse(url)
+    if not all([parsed_url.scheme, parsed_url.netloc]):
+        logger.warning(f"Invalid URL format: {url}")
+        job.failed_urls.add(url)
+        return False
+    return True
+
+
+def _keep_safe(job, verdicts):
+    safe_urls = []
+    for url, verdict in verdicts.items():
+        if verdict.safe:
+            safe_urls.append(url)
+        else:
+            logger.warning(f"Skipping link {url}: {verdict.reason}")
+            job.unsafe_urls.add(url)
+            PAGES.labels("blocked").inc()
+    if len(safe_urls) < len(verdicts):
+        job.publish()
+    return safe_urls
+
+
+def _vet_links(job, urls):
+    """Drop links that fail the safety check, links the frontier already saw are not re-checked"""
+    if not settings.SAFETY_CHECK_LINKS:
+        return urls
+    fresh = [url for url in urls if url not in job.frontier]
+    return _keep_safe(job, get_safety_checker().check(fresh, discovered=True)) if fresh else []
+
+
+async def _vet_links_async(job, urls):
+    if not settings.SAFETY_CHECK_LINKS:
+        return urls
+    fresh = [url for url in urls if url not in job.frontier]
+    return _keep_safe(job, await get_safety_checker().acheck(fresh, discovered=True)) if fresh else []
+
+
+@instrument("scrape_page")
+def scrape_single_page(job, url):
+    if url in job.scraped_urls or url in job.failed_urls:
+        return None, []
     
     try:
         # Validate URL format
-        parsed_url = urlparse(url)
-        # logger.info(f"Validated: {url}")
-        if not all([parsed_url.scheme, parsed_url.netloc]):
-            logger.warning(f"Invalid URL format: {url}")
-            failed_urls.add(url)
-            return []
-
-        # Get page content
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        
-        # Parse content
-        soup = BeautifulSoup(response.text, "html.parser")
-        title = soup.title.string if soup.title else "No Title"
-        text_content = "\n".join([p.get_text() for p in soup.find_all("p")])
-        
-        # Insert to MongoDB
-        try:
-            collection.insert_one({
-                "url": url,
-                "title": title,
-                "content": text_content,
-                "session_id": session_id
-            })
-            scraped_urls.add(url)
-            logger.info(f"Successfully scraped: {url}")
-        except PyMongoError as e:
-            logger.error(f"MongoDB insertion failed for {url}: {str(e)}")
-            failed_urls.add(url)
-            return []
-
-        # Collect links for next batch
-        new_urls = []
-        for link in soup.find_all("a", href=True):
-            try:
-                new_url = link["href"]
-                parsed_new_url = urlparse(new_url)
-                if parsed_new_url.netloc == "" or parsed_new_url.netloc == domain:
-                    absolute_url = new_url if parsed_new_url.netloc else f"{parsed_url.scheme}://{domain}{new_url}"
-                    new_urls.append(absolute_url)
-            except Exception as e:
-                logger.error(f"Error processing link {link}: {str(e)}")
-                continue
+        if not _is_valid_url(job, url):
+            return None, []
 
-        return new_urls
+        # Get page content over the pooled keep-alive session
+        state = job.page_state.get(url)
+        response = fetch_page(url, headers=conditional_headers(state))
+        if response.status_code == 304 and state:
+            document, new_urls = _not_modified(job, url, state)
+        else:
+            document, new_urls = process_page(job, url, response.text, response.headers, state, response.url)
+        return document, _vet_links(job, new_urls)
 
+    except UnsupportedContent as e:
+        logger.info(str(e))
+        return _failed(job, url)
     except RequestException as e:
+        if e.response is not None:
+            _record_http_error(job, url, e.response.status_code)
         logger.error(f"Request failed for {url}: {str(e)}")
-        failed_urls.add(url)
-        return []
+        return _failed(job, url, error=e.response is None)
     except Exception as e:
         logger.error(f"Unexpected error scraping {url}: {str(e)}")
-        failed_urls.add(url)
-        return []
+        return _failed(job, url, error=True)
 
-def start_scraping(url, session_id, max_workers=5, url_limit=100):
-    
-    create_qdrant_collection()
-    clean_collection()
+
+@instrument("scrape_page")
+async def scrape_single_page_async(job, crawler, url):
+    if url in job.scraped_urls or url in job.failed_urls:
+        return None, []
 
     try:
-        scraping_status.update(scraping=True, message="Starting scraping process...")
+        if not _is_valid_url(job, url):
+            return None, []
 
-        domain = urlparse(url).netloc
-        urls_to_scrape = [url]
-        
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            while urls_to_scrape and len(scraped_urls) < url_limit:
-                # Submit batch of URLs to thread pool
-                future_to_url = {
-                    executor.submit(scrape_single_page, url, domain, session_id): url 
-                    for url in urls_to_scrape[:url_limit - len(scraped_urls)] 
-                    if url not in scraped_urls and url not in failed_urls
-                }
-                
-                # Clear current batch
-                urls_to_scrape = []
-                
-                # Collect results and new URLs
-                for future in as_completed(future_to_url):
-                    if len(scraped_urls) >= url_limit:
-                        break
-                    new_urls = future.result()
-                    urls_to_scrape.extend(new_urls)
+        state = job.page_state.get(url)
+        response = await crawler.fetch(url, headers=conditional_headers(state))
+        if response.status_code == 304 and state:
+            document, new_urls = _not_modified(job, url, state)
+        elif offload.enabled():
+            # Parsed in the process pool, the event loop only awaits the batch
+            parsed = offload.parse(url, response.text, job.frontier.domain, response.url)
+            document, new_urls, digest = await asyncio.wrap_future(parsed)
+            document, new_urls = await asyncio.to_thread(store_page, job, url, document, new_urls, digest,
+                                                         response.headers, state)
+        else:
+            # Parsing and the Mongo insert are blocking, keep them off the event loop
+            document, new_urls = await asyncio.to_thread(process_page, job, url, response.text, response.headers,
+                                                         state, response.url)
+        return document, await _vet_links_async(job, new_urls)
+
+    except UnsupportedContent as e:
+        logger.info(str(e))
+        return _failed(job, url)
+    except httpx.HTTPStatusError as e:
+        _record_http_error(job, url, e.response.status_code)
+        logger.error(f"Request failed for {url}: {str(e)}")
+        return _failed(job, url)
+    except httpx.HTTPError as e:
+        logger.error(f"Request failed for {url}: {str(e)}")
+        return _failed(job, url, error=True)
+    except Exception as e:
+        logger.error(f"Unexpected error scraping {url}: {str(e)}")
+        return _failed(job, url, error=True)
+
+
+def _new_frontier(url):
+    start_url = normalize_url(url) or url
+    frontier = URLFrontier(urlparse(start_url).netloc, max_depth=settings.CRAWL_MAX_DEPTH)
+    frontier.push(start_url)
+    return frontier
+
+
+def _scrape_with_budget(job, url):
+    """Thread-mode page worker, holds one slot of the shared worker budget"""
+    job.budget.acquire(job.id)
+    try:
+        return scrape_single_page(job, url)
+    finally:
+        job.budget.release(job.id)
+
+
+def _crawl_threads(job):
+    frontier = job.frontier
+    pending = {}
+
+    with ThreadPoolExecutor(max_workers=job.max_workers) as executor:
+        while True:
+            # Keep every worker busy instead of waiting for a whole BFS level
+            while len(pending) < job.max_workers and len(job.scraped_urls) + len(pending) < job.url_limit:
+                item = frontier.pop()
+                if item is None:
+                    break
+                page_url, depth = item
+                future = executor.submit(_scrape_with_budget, job, page_url)
+                pending[future] = (page_url, depth)
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                page_url, depth = pending.pop(future)
+                _, new_urls = future.result()
+                for new_url in new_urls:
+                    frontier.push(new_url, depth + 1)
+
+
+async def _crawl_async(job):
+    """Crawl and index concurrently, pages become searchable while the crawl runs"""
+    frontier = job.frontier
+    in_flight = 0
+    wakeup = asyncio.Event()
+
+    pipeline = IngestionPipeline(job.session_id, status=job.status, sparse=job.sparse, on_progress=job.record,
+                                 on_error=job.unindexed_urls.add)
+    async with AsyncCrawler() as crawler, pipeline:
+        async def worker():
+            nonlocal in_flight
+            while True:
+                item = None
+                if len(job.scraped_urls) + in_flight < job.url_limit:
+                    item = frontier.pop()
+                if item is None:
+                    if in_flight == 0:
+                        wakeup.set()
+                        return
+                    # Other workers may still discover links, wait for one to finish
+                    wakeup.clear()
+                    await wakeup.wait()
+                    continue
+
+                page_url, depth = item
+                in_flight += 1
+                try:
+                    await job.budget.acquire_async(job.id)
+                    try:
+                        document, new_urls = await scrape_single_page_async(job, crawler, page_url)
+                    finally:
+                        job.budget.release(job.id)
+                    for new_url in new_urls:
+                        frontier.push(new_url, depth + 1)
+                    if document:
+                        await pipeline.put(document)
+                finally:
+                    in_flight -= 1
+                    wakeup.set()
+
+        await asyncio.gather(*(worker() for _ in range(crawler.concurrency)))
+
+
+def _same_site(job):
+    """Whether the stored pages were crawled from the same domain as this job's start URL"""
+    return any(urlparse(url).netloc == job.frontier.domain for url in job.page_state)
+
+
+def start_scraping(job):
+    """Run one ScrapeJob to completion, called from the JobScheduler pool"""
+    session_id = job.session_id
+    job.sparse = ensure_qdrant_collection() and settings.RETRIEVAL_MODE == "hybrid"
+    job.frontier = _new_frontier(job.url)
+    if job.incremental:
+        # Keep this session's pages, only changes are re-indexed
+        job.page_state = load_page_state(session_id)
+        if job.page_state and not _same_site(job):
+            logger.info(f"Job {job.id}: session {session_id} moved to {job.frontier.domain}, rebuilding it")
+            job.page_state = {}
+            job.incremental = False
+    if not job.incremental:
+        # Full rebuild of this session only, other sessions are untouched
+        delete_session_points(session_id)
+        clean_collection(session_id)
+        invalidate_answers(session_id)
+    job.page_writer = PageWriter(on_error=job.failed_urls.add)
+
+    try:
+        job.status.update(scraping=True, message="Starting scraping process...")
+
+        if job.mode == "async":
+            # Runs in a scheduler thread, so it gets its own loop.
+            # Embedding and upserting happen inside the crawl pipeline.
+            job.status.update(upserting=True)
+            asyncio.run(_crawl_async(job))
+        else:
+            _crawl_threads(job)
+        job.page_writer.flush()
         
-        logger.info(f"Scraping completed. Processed {len(scraped_urls)} URLs (limit: {url_limit})")
+        logger.info(f"Job {job.id}: processed {len(job.scraped_urls)} URLs (limit: {job.url_limit}, unchanged: {len(job.unchanged_urls)})")
+        if not job.scraped_urls:
+            # Nothing was reached, the stored pages are kept as they are
+            raise RuntimeError(f"Could not fetch the start URL {job.url}")
         
-        if scraped_urls:
-            scraping_status.update(scraping=False, upserting=True, message="Upserting to vector database...")
-            upsert_to_qdrant()
-            scraping_status.update(upserting=False, completed=True, message="Process completed successfully")
+        if job.mode != "async" and job.scraped_urls:
+            job.status.update(scraping=False, upserting=True, message="Upserting to vector database...")
+            changed = job.scraped_urls.snapshot() - job.unchanged_urls.snapshot()
+            upsert_to_qdrant(session_id, urls=changed if job.incremental else None, status=job.status,
+                             sparse=job.sparse, on_progress=job.record, on_error=job.unindexed_urls.add)
+        forget_unindexed_pages(job)
+
+        if job.page_state:
+            remove_stale_pages(job)
+
+        job.status.update(scraping=False, upserting=False, completed=True, message="Process completed successfully")
         
         return {
             "success": True,
-            "scraped": len(scraped_urls),
-            "failed": len(failed_urls),
-            "limit_reached": len(scraped_urls) >= url_limit
+            "scraped": len(job.scraped_urls),
+            "unchanged": len(job.unchanged_urls),
+            "failed": len(job.failed_urls),
+            "unindexed": len(job.unindexed_urls),
+            "limit_reached": len(job.scraped_urls) >= job.url_limit
         }
     except Exception as e:
-        scraping_status.update(scraping=False, upserting=False, completed=True, message=f"Error: {str(e)}")
+        job.status.update(scraping=False, upserting=False, completed=True, message=f"Error: {str(e)}")
         logger.error(f"Scraping failed: {str(e)}")
+        # Indexing may have stopped part way, every page written by this job has to be re-indexed
+        for url in job.scraped_urls.snapshot() - job.unchanged_urls.snapshot():
+            job.unindexed_urls.add(url)
+        forget_unindexed_pages(job)
         return {
             "success": False,
             "error": str(e)
         }
+    finally:
+        # Answers cached while the corpus was changing are stale now
+        invalidate_answers(session_id)
+
 
-def upsert_to_qdrant(batch_size=5):
+def forget_unindexed_pages(job):
+    """
+    Clear the validators and content hash of pages whose chunks did not reach
+    Qdrant, otherwise every incremental re-crawl would see a 304 or the same
+    hash and never index them again.
+    """
+    urls = job.unindexed_urls.snapshot()
+    if not urls:
+        return
     try:
-        data = list(collection.find({}, {"_id": 0}))
-        if not data:
-            logger.warning("No data found in MongoDB to upsert to Qdrant")
-            return
-        
-        embeddings = []
-        valid_data = []
+        reset_page_state(job.session_id, urls)
+        logger.warning(f"Job {job.id}: {len(urls)} pages were not indexed, they will be re-indexed on the next crawl")
+    except Exception as e:
+        logger.error(f"Could not reset page state for {len(urls)} unindexed pages: {str(e)}")
+
+
+def remove_stale_pages(job):
+    """
+    Delete pages that disappeared since the last crawl: anything that now
+    returns 404/410, plus pages no longer linked when the crawl ran to
+    completion without fetch errors. A page behind a failed fetch was not
+    reached, which says nothing about whether it still exists.
+    """
+    known = set(job.page_state)
+    stale = job.gone_urls.snapshot() & known
+    if len(job.scraped_urls) < job.url_limit and not job.error_urls:
+        stale |= known - job.scraped_urls.snapshot() - job.failed_urls.snapshot()
+    if not stale:
+        return
+    delete_url_points(job.session_id, list(stale))
+    delete_pages(job.session_id, list(stale))
+    logger.info(f"Removed {len(stale)} stale pages for session {job.session_id}")
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _iter_chunks(documents):
+    if offload.enabled():
+        # One pool task per batch of documents
+        for batch in _batched(documents, settings.INGEST_BATCH_SIZE):
+            for doc, chunks in zip(batch, offload.chunk_many([doc["content"] for doc in batch])):
+                for chunk in chunks:
+                    yield {**doc, **chunk}
+        return
+    for doc in documents:
+        for chunk in chunk_document(doc["content"]):
+            yield {**doc, **chunk}
+
+
+@instrument("upsert_to_qdrant")
+def upsert_to_qdrant(session_id, urls=None, batch_size=None, status=None, sparse=False, on_progress=None,
+                     on_error=None):
+    """on_error is called with the url of every page that was not fully indexed"""
+    batch_size = batch_size or settings.EMBED_BATCH_SIZE
+    upserter = BulkUpserter(on_error=on_error)
+    embedded = 0
+    try:
+        # Stream the corpus from a cursor so memory stays bounded by one batch
+        cursor = iter_session_pages(session_id, urls)
         
-        for i in range(0, len(data), batch_size):
-            batch = data[i:i + batch_size]
+        for batch_number, batch in enumerate(_batched(_iter_chunks(cursor), batch_size), start=1):
             try:
-                batch_embeddings = get_embeddings([doc["content"] for doc in batch])
-                embeddings.extend(batch_embeddings)
-                valid_data.extend(batch)
-                logger.info(f"Generated embeddings for batch {i//batch_size + 1}")
+                texts = [doc["content"] for doc in batch]
+                batch_embeddings = get_embeddings(texts, offload.embedder())
+                embedded += len(batch)
+                logger.info(f"Generated embeddings for batch {batch_number}")
+                if settings.INGEST_SUMMARIES:
+                    for doc, summary in zip(batch, get_summarizer().summarize_many(texts)):
+                        if summary is not None:
+                            doc["summary"] = summary
             except Exception as e:
                 logger.error(f"Batch embedding failed: {str(e)}")
+                if on_error:
+                    for url in {doc["url"] for doc in batch}:
+                        on_error(url)
                 continue
-        
-        if not embeddings:
-            logger.warning("No valid embeddings generated")
+
+            upserter.add([
+                {
+                    "id": point_id(doc["session_id"], doc["url"], doc["chunk_index"]),
+                    "vector": point_vector(batch_embeddings[j], doc["content"] if sparse else None),
+                    "payload": doc
+                }
+                for j, doc in enumerate(batch)
+            ])
+            if status:
+                status.update(message=f"Upserting batch {batch_number} ({upserter.upserted} chunks indexed)")
+            if on_progress:
+                on_progress(embedded=embedded, upserted=upserter.upserted)
+
+        upserter.close()
+        if on_progress:
+            on_progress(upserted=upserter.upserted)
+        if not upserter.upserted:
+            logger.warning("No documents were upserted to Qdrant")
             return
-            
-        total_points = len(valid_data)
-        for i in range(0, total_points, batch_size):
-            batch_end = min(i + batch_size, total_points)
-            points_batch = [
-                {"id": j, "vector": embeddings[j], "payload":{
-                                                            **valid_data[j],
-                                                            "session_id": valid_data[j]["session_id"]}}
-                for j in range(i, batch_end)
-            ]
-            
-            try:
-                # Increase timeout for larger batches
-                qdrant_client.upsert(
-                    collection_name=settings.COLLECTION_NAME,
-                    points=points_batch,
-                    wait = True
-                )
-                logger.info(f"Successfully upserted batch {i//batch_size + 1} ({len(points_batch)} points)")
-                scraping_status.update(message=f"Upserting batch {i//batch_size + 1} of {(total_points + batch_size - 1)//batch_size}")
-            except UnexpectedResponse as e:
-                logger.error(f"Batch {i//batch_size + 1} upsert failed: {str(e)}")
-                continue
-            
-        logger.info(f"Completed upserting all {total_points} documents to Qdrant")
+
+        logger.info(f"Completed upserting {upserter.upserted} chunks to Qdrant ({upserter.failed} failed)")
         
     except Exception as e:
-        scraping_status.update(message=f"Upsertion error: {str(e)}")
+        if status:
+            status.update(message=f"Upsertion error: {str(e)}")
         logger.error(f"Unexpected error during Qdrant upsert: {str(e)}")
         raise 
 
-    except PyMongoError as e:
-        logger.error(f"MongoDB error during Qdrant upsert: {str(e)}")
-    except UnexpectedResponse as e:
-        logger.error(f"Qdrant upsert failed: {str(e)}")
-    except Exception as e:
-        logger.error(f"Unexpected error during Qdrant upsert: {str(e)}")
 
-def create_qdrant_collection():
-    try:
-        if qdrant_client.collection_exists(settings.COLLECTION_NAME):
-            qdrant_client.delete_collection(settings.COLLECTION_NAME)
-            
-        qdrant_client.create_collection(
-            collection_name=settings.COLLECTION_NAME,
-            vectors_config=VectorParams(size=384, distance=Distance.COSINE),
-        )
-        logger.info("Qdrant collection created")
-    except UnexpectedResponse as e:
-        logger.error(f"Qdrant collection creation failed: {str(e)}")
\ No newline at end of file
+scheduler = JobScheduler(run=start_scraping)
@@ -0,0 +1,391 @@
+"""
+Portable snapshots of one session's indexed corpus, to restore it (under the
+same or a new session id) without crawling and embedding it again:
+
+    python -m services.snapshot export SESSION_ID [--path DIR] [--dtype int8]
+    python -m services.snapshot import DIR [--session-id NEW_ID]
+
+A snapshot is a directory:
+
+    manifest.json   format version, embedding model, counts and column types
+    vectors.npy     (chunks, dimensions) float32 or int8 matrix, opened with mmap
+    scales.npy      per-row float32 scales of an int8 matrix
+    chunks.*        columnar chunk payloads, row i belongs to vector i
+    pages.*         columnar Mongo pages, so incremental re-crawls keep working
+
+String columns are one UTF-8 blob plus an int64 offsets array, both memory
+mapped, so reading a row never loads the whole file.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from functools import lru_cache
+from typing import List, NamedTuple
+import numpy as np
+from config.config import settings
+from services.answer_cache import invalidate_answers
+from services.embeddings import cache_name
+from services.mongo import clean_collection, iter_session_pages, PageWriter
+from services.qdrant import (get_qdrant_client, BulkUpserter, dense_vector, point_id, point_vector,
+                             ensure_qdrant_collection, delete_session_points)
+
+logger = logging.getLogger(__name__)
+
+FORMAT = "smartagent-snapshot"
+VERSION = 1
+MANIFEST = "manifest.json"
+
+CHUNK_COLUMNS = {
+    "url": "str", "title": "str", "content": "str", "summary": "str",
+    "chunk_index": "int", "start": "int", "end": "int", "heading_path": "json",
+}
+PAGE_COLUMNS = {
+    "url": "str", "title": "str", "content": "str", "content_hash": "str",
+    "etag": "json", "last_modified": "json", "links": "json",
+}
+PAGE_PROJECTION = {"_id": 0, **{column: 1 for column in PAGE_COLUMNS}}
+
+# Rows scored per block in the NumPy fallback, bounds the float32 copy of an int8 matrix
+SEARCH_BLOCK = 65536
+
+
+def snapshot_path(session_id: str) -> str:
+    """Default snapshot directory of a session, named by a hash since session ids come from clients"""
+    return os.path.join(settings.SNAPSHOT_DIR, hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:32])
+
+
+class TableWriter:
+    """Appends rows column by column, string data is streamed straight to disk"""
+
+    def __init__(self, directory: str, name: str, columns: dict):
+        self.prefix = os.path.join(directory, name)
+        self.columns = columns
+        self.rows = 0
+        self._values = {column: [] for column, kind in columns.items() if kind == "int"}
+        self._offsets = {column: [0] for column, kind in columns.items() if kind != "int"}
+        self._files = {column: open(f"{self.prefix}.{column}.bin", "wb") for column in self._offsets}
+
+    def append(self, row: dict):
+        for column, kind in self.columns.items():
+            value = row.get(column)
+            if kind == "int":
+                self._values[column].append(value or 0)
+                continue
+            if kind == "json":
+                value = json.dumps(value)
+            data = (value or "").encode("utf-8")
+            self._files[column].write(data)
+            self._offsets[column].append(self._offsets[column][-1] + len(data))
+        self.rows += 1
+
+    def close(self):
+        for column, values in self._values.items():
+            np.save(f"{self.prefix}.{column}.npy", np.asarray(values, dtype=np.int64))
+        for column, offsets in self._offsets.items():
+            self._files[column].close()
+            np.save(f"{self.prefix}.{column}.offsets.npy", np.asarray(offsets, dtype=np.int64))
+
+
+class Table:
+    """Memory-mapped reader for a TableWriter table"""
+
+    def __init__(self, directory: str, name: str, columns: dict, rows: int):
+        prefix = os.path.join(directory, name)
+        self.columns = columns
+        self.rows = rows
+        self._ints, self._strings = {}, {}
+        for column, kind in columns.items():
+            if kind == "int":
+                self._ints[column] = np.load(f"{prefix}.{column}.npy", mmap_mode="r")
+                continue
+            offsets = np.load(f"{prefix}.{column}.offsets.npy", mmap_mode="r")
+            # An empty file cannot be memory mapped
+            data = np.memmap(f"{prefix}.{column}.bin", dtype=np.uint8, mode="r") if offsets[-1] else b""
+            self._strings[column] = (offsets, data)
+
+    def _value(self, column, i):
+        if column in self._ints:
+            return int(self._ints[column][i])
+        offsets, data = self._strings[column]
+        text = bytes(data[offsets[i]:offsets[i + 1]]).decode("utf-8")
+        return json.loads(text) if self.columns[column] == "json" else text
+
+    def row(self, i: int) -> dict:
+        return {column: self._value(column, i) for column in self.columns}
+
+    def rows_between(self, start: int, stop: int) -> List[dict]:
+        return [self.row(i) for i in range(start, min(stop, self.rows))]
+
+
+def quantize(vectors: np.ndarray):
+    """Symmetric per-row int8 quantization, returns (int8 matrix, float32 scales)"""
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+class Snapshot:
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != FORMAT or self.manifest.get("version") != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} corpus snapshot")
+        self.count = self.manifest["count"]
+        self.session_id = self.manifest["session_id"]
+        self.model = self.manifest["model"]
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.scales = np.load(os.path.join(path, "scales.npy"), mmap_mode="r") \
+            if self.manifest["dtype"] == "int8" else None
+        self.chunks = Table(path, "chunks", self.manifest["chunk_columns"], self.count)
+        self.pages = Table(path, "pages", self.manifest["page_columns"], self.manifest["pages"])
+
+    def dense(self, start: int, stop: int) -> np.ndarray:
+        """float32 rows [start, stop), dequantized when stored as int8"""
+        stop = min(stop, self.count)
+        block = np.asarray(self.vectors[start:stop], dtype=np.float32)
+        if self.scales is not None:
+            block *= self.scales[start:stop, None]
+        return block
+
+
+def _session_filter(session_id):
+    from qdrant_client import models
+    return models.Filter(must=[models.FieldCondition(key="session_id", match=models.MatchValue(value=session_id))])
+
+
+def export_session(session_id: str, path: str = None, dtype: str = None, batch_size: int = None) -> dict:
+    """Write a session's chunks, vectors and pages to a snapshot directory, returns its manifest"""
+    path = path or snapshot_path(session_id)
+    dtype = dtype or settings.SNAPSHOT_DTYPE
+    batch_size = batch_size or settings.UPSERT_BATCH_SIZE
+    if dtype not in ("float32", "int8"):
+        raise ValueError(f"Unsupported snapshot dtype: {dtype}")
+
+    client = get_qdrant_client()
+    session_filter = _session_filter(session_id)
+    count = client.count(collection_name=settings.COLLECTION_NAME, count_filter=session_filter, exact=True).count
+    if not count:
+        raise ValueError(f"Session {session_id} has no indexed chunks")
+
+    os.makedirs(path, exist_ok=True)
+    manifest_path = os.path.join(path, MANIFEST)
+    if os.path.exists(manifest_path):
+        # The manifest marks a complete snapshot, remove it first so a failed export is not mistaken for one
+        os.remove(manifest_path)
+
+    vectors = scales = None
+    chunks = TableWriter(path, "chunks", CHUNK_COLUMNS)
+    written, offset = 0, None
+    while written < count:
+        points, offset = client.scroll(
+            collection_name=settings.COLLECTION_NAME,
+            scroll_filter=session_filter,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        # Points added after the count are left for the next export
+        points = points[:count - written]
+        if not points:
+            break
+        batch = np.asarray([dense_vector(point) for point in points], dtype=np.float32)
+        if vectors is None:
+            vectors = np.lib.format.open_memmap(os.path.join(path, "vectors.npy"), mode="w+",
+                                                dtype=np.dtype(dtype), shape=(count, batch.shape[1]))
+            if dtype == "int8":
+                scales = np.lib.format.open_memmap(os.path.join(path, "scales.npy"), mode="w+",
+                                                   dtype=np.float32, shape=(count,))
+        rows = slice(written, written + len(batch))
+        if dtype == "int8":
+            vectors[rows], scales[rows] = quantize(batch)
+        else:
+            vectors[rows] = batch
+        for point in points:
+            chunks.append(point.payload)
+        written += len(batch)
+        if offset is None:
+            break
+    chunks.close()
+    if vectors is None:
+        raise ValueError(f"Session {session_id} has no indexed chunks")
+    vectors.flush()
+    if scales is not None:
+        scales.flush()
+
+    pages = TableWriter(path, "pages", PAGE_COLUMNS)
+    for page in iter_session_pages(session_id, projection=PAGE_PROJECTION):
+        pages.append(page)
+    pages.close()
+
+    manifest = {
+        "format": FORMAT,
+        "version": VERSION,
+        "session_id": session_id,
+        "created_at": time.time(),
+        "model": cache_name(),
+        "dimensions": vectors.shape[1],
+        "dtype": dtype,
+        "count": written,
+        "pages": pages.rows,
+        "chunk_columns": CHUNK_COLUMNS,
+        "page_columns": PAGE_COLUMNS,
+    }
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    logger.info(f"Exported {written} chunks and {pages.rows} pages of session {session_id} to {path}")
+    return manifest
+
+
+def _chunk_payload(row: dict, session_id: str) -> dict:
+    payload = {**row, "session_id": session_id}
+    if not payload["summary"]:
+        del payload["summary"]
+    return payload
+
+
+def import_snapshot(path: str, session_id: str = None, batch_size: int = None) -> dict:
+    """
+    Bulk-load a snapshot into Qdrant and Mongo, replacing whatever the target
+    session had. The snapshot's embedding model must match the configured one.
+    """
+    snapshot = Snapshot(path)
+    if snapshot.model != cache_name():
+        raise ValueError(f"Snapshot was embedded with {snapshot.model}, the configured model is {cache_name()}")
+    session_id = session_id or snapshot.session_id
+    batch_size = batch_size or settings.UPSERT_BATCH_SIZE
+
+    sparse = ensure_qdrant_collection() and settings.RETRIEVAL_MODE == "hybrid"
+    delete_session_points(session_id)
+    clean_collection(session_id)
+
+    upserter = BulkUpserter(batch_size=batch_size)
+    for start in range(0, snapshot.count, batch_size):
+        vectors = snapshot.dense(start, start + batch_size)
+        rows = snapshot.chunks.rows_between(start, start + batch_size)
+        upserter.add([
+            {
+                "id": point_id(session_id, row["url"], row["chunk_index"]),
+                "vector": point_vector(vector.tolist(), row["content"] if sparse else None),
+                "payload": _chunk_payload(row, session_id),
+            }
+            for row, vector in zip(rows, vectors)
+        ])
+    upserter.close()
+
+    failed_pages = []
+    writer = PageWriter(on_error=failed_pages.append)
+    for i in range(snapshot.pages.rows):
+        writer.replace({**snapshot.pages.row(i), "session_id": session_id})
+    writer.flush()
+    invalidate_answers(session_id)
+
+    # Lets the NumPy fallback find the snapshot under the new session id too
+    target = snapshot_path(session_id)
+    if not os.path.exists(target):
+        try:
+            os.makedirs(settings.SNAPSHOT_DIR, exist_ok=True)
+            os.symlink(os.path.abspath(path), target, target_is_directory=True)
+        except OSError as e:
+            logger.warning(f"Could not link {target} to the snapshot: {str(e)}")
+
+    result = {
+        "session_id": session_id,
+        "points": upserter.upserted,
+        "failed_points": upserter.failed,
+        "pages": snapshot.pages.rows - len(failed_pages),
+        "failed_pages": len(failed_pages),
+    }
+    logger.info(f"Imported snapshot {path}: {result}")
+    return result
+
+
+class SnapshotPoint(NamedTuple):
+    """Stands in for a Qdrant ScoredPoint"""
+    id: str
+    score: float
+    payload: dict
+    vector: List[float]
+
+
+class SnapshotIndex:
+    """Exact cosine search over a snapshot's memory-mapped matrix, for small corpora"""
+
+    def __init__(self, snapshot: Snapshot, session_id: str):
+        self.snapshot = snapshot
+        self.session_id = session_id
+
+    def search(self, query_vector: List[float], limit: int) -> List[SnapshotPoint]:
+        query = np.asarray(query_vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        count = self.snapshot.count
+        scores = np.empty(count, dtype=np.float32)
+        norms = np.empty(count, dtype=np.float32)
+        for start in range(0, count, SEARCH_BLOCK):
+            block = self.snapshot.dense(start, start + SEARCH_BLOCK)
+            scores[start:start + len(block)] = block @ query
+            norms[start:start + len(block)] = np.linalg.norm(block, axis=1)
+        norms[norms == 0] = 1
+        scores /= norms
+
+        limit = min(limit, count)
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        results = []
+        for i in top:
+            row = self.snapshot.chunks.row(int(i))
+            results.append(SnapshotPoint(
+                id=point_id(self.session_id, row["url"], row["chunk_index"]),
+                score=float(scores[i]),
+                payload=_chunk_payload(row, self.session_id),
+                vector=self.snapshot.dense(int(i), int(i) + 1)[0].tolist(),
+            ))
+        return results
+
+
+@lru_cache(maxsize=8)
+def _open_index(path: str, session_id: str, modified: float) -> SnapshotIndex:
+    return SnapshotIndex(Snapshot(path), session_id)
+
+
+def get_snapshot_index(session_id: str) -> SnapshotIndex | None:
+    """Fallback index for a session, None when it has no snapshot or it is too large to scan"""
+    if not settings.SNAPSHOT_FALLBACK:
+        return None
+    path = snapshot_path(session_id)
+    try:
+        # Keyed on the manifest's mtime, so a fresh export is picked up
+        index = _open_index(path, session_id, os.path.getmtime(os.path.join(path, MANIFEST)))
+    except FileNotFoundError:
+        return None
+    if index.snapshot.count > settings.SNAPSHOT_FALLBACK_MAX_POINTS:
+        logger.warning(f"Snapshot of {session_id} has {index.snapshot.count} chunks, too many for the NumPy fallback")
+        return None
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import a session's indexed corpus")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="write a session's corpus to a snapshot")
+    export_parser.add_argument("session_id")
+    export_parser.add_argument("--path", help=f"snapshot directory (default: under {settings.SNAPSHOT_DIR}, named by a hash of SESSION_ID)")
+    export_parser.add_argument("--dtype", choices=["float32", "int8"], default=None)
+    import_parser = commands.add_parser("import", help="bulk-load a snapshot into Qdrant and Mongo")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--session-id", help="restore into this session (default: the exported one)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "export":
+        print(json.dumps(export_session(args.session_id, args.path, args.dtype), indent=2))
+    else:
+        print(json.dumps(import_snapshot(args.path, args.session_id), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import re
+import zlib
+from collections import Counter
+from config.config import settings
+
+# Identifiers, flags, dotted names and error codes stay whole: "--max-depth", "os.path", "ERR_TIMEOUT"
+TERM_RE = re.compile(r"[A-Za-z0-9_]+(?:[.\-:/][A-Za-z0-9_]+)*")
+PART_RE = re.compile(r"[A-Za-z0-9]+")
+
+
+def lexical_terms(text: str) -> list[str]:
+    """Lowercased terms, compound terms also contribute their parts"""
+    terms = []
+    for match in TERM_RE.finditer(text):
+        term = match.group(0).lower()
+        terms.append(term)
+        parts = PART_RE.findall(term)
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+
+def term_index(term: str) -> int:
+    """Stable 31-bit hash, the same term maps to the same sparse dimension in every process"""
+    return zlib.crc32(term.encode("utf-8")) & 0x7FFFFFFF
+
+
+def _to_sparse(weights: dict):
+    from qdrant_client import models
+    indices = sorted(weights)
+    return models.SparseVector(indices=indices, values=[weights[i] for i in indices])
+
+
+def document_sparse_vector(text: str):
+    """
+    BM25 term-frequency weights of a chunk. The IDF half of BM25 is applied
+    by Qdrant at query time (Modifier.IDF), so it stays right as the corpus grows.
+    """
+    terms = lexical_terms(text)
+    k1, b = settings.BM25_K1, settings.BM25_B
+    length_norm = 1 - b + b * len(terms) / settings.BM25_AVG_CHUNK_TERMS
+    weights = Counter()
+    for term, tf in Counter(terms).items():
+        weights[term_index(term)] += tf * (k1 + 1) / (tf + k1 * length_norm)
+    return _to_sparse(weights)
+
+
+def query_sparse_vector(text: str):
+    return _to_sparse({term_index(term): 1.0 for term in set(lexical_terms(text))})
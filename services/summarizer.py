@@ -0,0 +1,98 @@
+import hashlib
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from threading import Lock
+from typing import List
+from config.config import settings
+from services.metrics import instrument, ITEMS
+
+logger = logging.getLogger(__name__)
+
+
+def needs_summary(content: str) -> bool:
+    """Short passages are already as compact as a summary would be, they are used as is"""
+    return len(content) >= settings.SUMMARY_MIN_CHARS
+
+
+class Summarizer:
+    """Gemini summaries, fanned out over a small thread pool"""
+
+    def __init__(self, concurrency: int = None):
+        self.model = None
+        try:
+            # Heavy SDK, only imported once summaries are needed
+            import google.generativeai as genai
+            genai.configure(api_key=settings.GOOGLE_API_KEY)
+            self.model = genai.GenerativeModel('gemini-1.5-flash')
+        except Exception:
+            logger.error("Summarizer error")
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency or settings.SUMMARY_CONCURRENCY,
+            thread_name_prefix="summarizer",
+        )
+
+    @instrument("summarize")
+    def summarize(self, content: str) -> str | None:
+        """
+        Summarize content using Google's Generative AI. None for passages too
+        short to need a summary, so their text is not stored twice, and when
+        Gemini is unavailable or fails.
+        """
+        if not needs_summary(content):
+            return None
+        ITEMS.labels("summarized").inc()
+        try:
+            prompt = f"""Summarize the following text while maintaining key information:
+
+            {content}
+            """
+
+            response = self.model.generate_content(prompt)
+            return response.text
+
+        except Exception as e:
+            logger.error(f"Summarization failed: {str(e)}")
+            return None
+
+    def summarize_many(self, contents: List[str]) -> List[str | None]:
+        """Summarize several passages concurrently, preserving order"""
+        return list(self._executor.map(self.summarize, contents))
+
+
+class SummaryMemo:
+    """
+    Bounded LRU of summaries keyed by a hash of the chunk content. Point ids
+    survive re-ingestion, so a changed chunk must not get its old summary.
+    """
+
+    def __init__(self, max_size: int = 2048):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def _key(content: str) -> str:
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def get(self, content: str):
+        key = self._key(content)
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, content: str, summary: str):
+        key = self._key(content)
+        with self._lock:
+            self._items[key] = summary
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+@lru_cache(maxsize=1)
+def get_summarizer() -> Summarizer:
+    return Summarizer()
@@ -1,47 +1,60 @@
-from pysafebrowsing import SafeBrowsing
-from urllib.parse import urlparse
 import logging
-from config.config import settings
-from huggingface_hub import InferenceClient
-from typing import List
-
-hf_client = InferenceClient(token=settings.HF_API_KEY)
+import asyncio
+from typing import Callable, List
+from services.embeddings import get_backend, get_batcher, cache_name
+from services.embedding_cache import get_embedding_cache
+from services.safety import get_safety_checker
+from services.metrics import instrument, ITEMS
 
 logger = logging.getLogger(__name__)
 
-def get_embeddings(texts: List[str]) -> List[List[float]]:
-    """Get embeddings using Hugging Face Inference API"""
+@instrument("embed")
+def get_embeddings(texts: List[str], embed: Callable = None) -> List[List[float]]:
+    """
+    Get embeddings from the configured backend, serving unchanged texts from the cache.
+    embed replaces the in-process backend for cache misses, e.g. with the ingestion process pool.
+    """
     try:
-        # The API accepts both single strings and lists of strings
-        embeddings = hf_client.feature_extraction(
-            texts,
-            model=settings.EMBEDDING_MODEL,
-            
-        )
+        embed = embed or get_backend().embed
+        cache = get_embedding_cache()
+        ITEMS.labels("embedded").inc(len(texts))
+        if cache is None:
+            return embed(texts)
+
+        embeddings = cache.get_many(cache_name(), texts)
+        misses = [i for i, vector in enumerate(embeddings) if vector is None]
+        ITEMS.labels("embedding_cache_hits").inc(len(texts) - len(misses))
+        if misses:
+            miss_texts = [texts[i] for i in misses]
+            vectors = embed(miss_texts)
+            cache.put_many(cache_name(), miss_texts, vectors)
+            for i, vector in zip(misses, vectors):
+                embeddings[i] = vector
         return embeddings
     except Exception as e:
         logger.error(f"Embedding generation failed: {str(e)}")
         raise
 
+async def load_off_loop(getter: Callable):
+    """
+    Call an lru_cache'd getter that may load a model. Until it has built its
+    value once it runs in a worker thread, so the event loop never blocks on the load.
+    """
+    if getter.cache_info().currsize:
+        return getter()
+    return await asyncio.to_thread(getter)
 
-safe_browsing = SafeBrowsing(settings.GOOGLE_API_KEY)
-
-def is_onion_domain(url: str) -> bool:
-    """Check if URL is a .onion (Tor) domain"""
-    parsed = urlparse(url)
-    return parsed.netloc.endswith('.onion')
+@instrument("embed_query")
+async def aembed_query(text: str) -> List[float]:
+    """Embed a single query, coalesced with concurrent callers into one batch without blocking the event loop"""
+    try:
+        batcher = await load_off_loop(get_batcher)
+        vectors = await asyncio.wrap_future(batcher.submit([text]))
+        return vectors[0]
+    except Exception as e:
+        logger.error(f"Query embedding failed: {str(e)}")
+        raise
 
-def contains_suspicious_keywords(url: str) -> bool:
-    """Check for suspicious keywords in URL"""
-    suspicious_keywords = [
-        'xxx', 'porn', 'adult', 'nsfw', 'sex',
-        'gambling', 'bet', 'casino',
-        'hack', 'crack', 'warez', 'torrent',
-        'drugs', 'darknet', 'blackmarket'
-    ]
-    
-    url_lower = url.lower()
-    return any(keyword in url_lower for keyword in suspicious_keywords)
 
 def is_url_safe(url: str) -> tuple[bool, str]:
     """
@@ -49,33 +62,8 @@ def is_url_safe(url: str) -> tuple[bool, str]:
     Returns: (is_safe: bool, reason: str)
     """
     try:
-        # Basic URL format validation
-        parsed = urlparse(url)
-        if not all([parsed.scheme, parsed.netloc]):
-            return False, "Invalid URL format"
-        
-        # Check for HTTPS
-        if parsed.scheme != 'https':
-            return False, "Only HTTPS URLs are allowed"
-        
-        # Check for .onion domains
-        if is_onion_domain(url):
-            return False, "Tor/Onion domains are not allowed"
-            
-        # Check for suspicious keywords
-        if contains_suspicious_keywords(url):
-            return False, "URL contains suspicious keywords"
-            
-        result = safe_browsing.lookup_urls([url])
-        
-        if result and url in result:
-            url_result = result[url]
-            if 'malicious' in url_result and url_result['malicious']:
-                threats = url_result.get('threats', [])
-                return False, f"URL flagged as unsafe: {', '.join(threats)}"
-        
-        return True, "URL is safe"
-        
+        verdict = get_safety_checker().check([url])[url]
+        return verdict.safe, verdict.reason
     except Exception as e:
         logger.error(f"URL safety check failed: {str(e)}")
-        return False, f"Safety check failed: {str(e)}"
\ No newline at end of file
+        return False, f"Safety check failed: {str(e)}"